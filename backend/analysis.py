@@ -1,11 +1,252 @@
-from typing import List, Dict, Optional
-from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple
+from dataclasses import asdict, dataclass
+from collections import OrderedDict
 from datetime import datetime
-from models import db, Patent, Company
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import copy
+import hashlib
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from models import normalize_claims
+from catalog import CompanySnapshot, PatentSnapshot, get_patent, get_company
+from llm_cache import CompletionCache, make_cache_key
+from embeddings import ClaimPrefilter
+from product_store import ProductAnalysisStore
+import metrics
 import logging
 import json
 import openai
 
+# 請求優先順序，數字越小越先取得配額
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+class TokenBucketLimiter:
+    """RPM 與 TPM 兩個令牌桶，等待者依優先順序取得配額"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, burst_seconds: float = 5.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # 桶容量只有幾秒的配額，啟動或閒置後不會一口氣送出整分鐘的請求
+        self.max_requests = max(1.0, requests_per_minute * burst_seconds / 60)
+        self.max_tokens = max(1.0, tokens_per_minute * burst_seconds / 60)
+        self._requests = self.max_requests
+        self._tokens = self.max_tokens
+        self._updated_at = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._requests = min(self.max_requests,
+                             self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.max_tokens,
+                           self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _wait_time(self, tokens: float) -> float:
+        request_wait = max(0.0, 1 - self._requests) * 60 / self.requests_per_minute
+        token_wait = max(0.0, tokens - self._tokens) * 60 / self.tokens_per_minute
+        return max(request_wait, token_wait)
+
+    def acquire(self, tokens: int, priority: int = PRIORITY_INTERACTIVE) -> None:
+        # 超過桶容量的請求只等到滿桶，再扣掉全部用量讓桶變負，後面的請求會多等
+        needed = min(tokens, self.max_tokens)
+        with self._cond:
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == entry:
+                        wait = self._wait_time(needed)
+                        if wait <= 0:
+                            self._requests -= 1
+                            self._tokens -= tokens
+                            return
+                        self._cond.wait(timeout=wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def adjust(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """以實際用量修正預估的 token 數"""
+        with self._cond:
+            self._tokens -= actual_tokens - estimated_tokens
+            self._cond.notify_all()
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """粗估請求的 token 數：英文約 4 個字元一個 token"""
+    return len(prompt) // 4 + max_tokens
+
+
+# gpt-3.5-turbo-instruct 的 context 長度；預估值偏粗，只用九成以免超出
+COMPLETION_CONTEXT_TOKENS = 4096
+CONTEXT_SAFETY_RATIO = 0.9
+
+
+def _is_context_length_error(error: Exception) -> bool:
+    """prompt 加上 max_tokens 超過模型 context 長度時，API 回傳的 InvalidRequestError"""
+    invalid_request = getattr(getattr(openai, 'error', None), 'InvalidRequestError', None)
+    if invalid_request is None or not isinstance(error, invalid_request):
+        return False
+    return getattr(error, 'code', None) == 'context_length_exceeded' or 'context length' in str(error)
+
+
+def _retryable_errors():
+    names = ('RateLimitError', 'APIError', 'ServiceUnavailableError', 'Timeout',
+             'APIConnectionError', 'TryAgain')
+    error_module = getattr(openai, 'error', None)
+    return tuple(getattr(error_module, name) for name in names if hasattr(error_module, name))
+
+
+class LLMClient:
+    """所有 OpenAI 請求（completion 與 embedding）的共用出口：限流、重試與優先順序"""
+
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 api_base: Optional[str] = None,
+                 requests_per_minute: float = 3500,
+                 tokens_per_minute: float = 90000,
+                 max_retries: int = 6,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 60.0,
+                 burst_seconds: float = 5.0,
+                 completion_fn: Optional[Callable] = None,
+                 embedding_fn: Optional[Callable] = None):
+        self.api_key = api_key
+        self.api_base = api_base
+        self.limiter = TokenBucketLimiter(requests_per_minute, tokens_per_minute, burst_seconds)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.completion_fn = completion_fn or openai.Completion.create
+        self.embedding_fn = embedding_fn or openai.Embedding.create
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_env(cls, api_key: Optional[str] = None) -> 'LLMClient':
+        # OPENAI_RPM/TPM 是整個帳號的額度，由共用金鑰的行程（gunicorn worker 與批次 CLI）平分
+        processes = max(1, int(os.environ.get('OPENAI_PROCESS_COUNT', 1)))
+        return cls(api_key=api_key,
+                   api_base=os.environ.get('OPENAI_API_BASE'),
+                   requests_per_minute=float(os.environ.get('OPENAI_RPM', 3500)) / processes,
+                   tokens_per_minute=float(os.environ.get('OPENAI_TPM', 90000)) / processes,
+                   max_retries=int(os.environ.get('OPENAI_MAX_RETRIES', 6)),
+                   burst_seconds=float(os.environ.get('OPENAI_BURST_SECONDS', 5)))
+
+    def _is_retryable(self, error: Exception) -> bool:
+        status = getattr(error, 'http_status', None)
+        # APIError 也涵蓋 4xx，只有 429 與 5xx 值得重試
+        return status is None or status == 429 or status >= 500
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = (getattr(error, 'headers', None) or {}).get('retry-after')
+        if retry_after:
+            try:
+                # Retry-After 過大時也不要讓執行緒停太久
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _request(self, request_fn: Callable, params: Dict, estimated: int, priority: int) -> Any:
+        """經過限流送出一個請求，遇到 429 與 5xx 時退避重試"""
+        model = params['model']
+        if self.api_key:
+            params['api_key'] = self.api_key
+        if self.api_base:
+            params['api_base'] = self.api_base
+
+        retryable = _retryable_errors()
+        attempt = 0
+        while True:
+            with metrics.span('rate_limit_wait'):
+                self.limiter.acquire(estimated, priority)
+            started = time.perf_counter()
+            try:
+                response = request_fn(**params)
+            except retryable as e:
+                retry = attempt < self.max_retries and self._is_retryable(e)
+                metrics.observe_llm_call(model, 'retry' if retry else 'error', time.perf_counter() - started)
+                if not retry:
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.logger.warning(f'OpenAI request failed ({str(e)}), retry {attempt} in {delay:.1f}s')
+                time.sleep(delay)
+                continue
+            except Exception:
+                metrics.observe_llm_call(model, 'error', time.perf_counter() - started)
+                raise
+
+            usage = getattr(response, 'usage', None)
+            metrics.observe_llm_call(model, 'ok', time.perf_counter() - started, usage)
+            if usage is not None and getattr(usage, 'total_tokens', None):
+                self.limiter.adjust(estimated, usage.total_tokens)
+            return response
+
+    def complete(self,
+                 prompt: str,
+                 max_tokens: int,
+                 temperature: float,
+                 model: str,
+                 priority: int = PRIORITY_INTERACTIVE) -> str:
+        params = {'model': model, 'prompt': prompt, 'max_tokens': max_tokens, 'temperature': temperature}
+        response = self._request(self.completion_fn, params, estimate_tokens(prompt, max_tokens), priority)
+        return response.choices[0].text
+
+    def embed(self, texts: List[str], model: str, priority: int = PRIORITY_INTERACTIVE) -> List[List[float]]:
+        """取得 embeddings，依輸入順序回傳"""
+        params = {'model': model, 'input': texts}
+        response = self._request(self.embedding_fn, params, estimate_tokens(''.join(texts), 0), priority)
+        return [item['embedding'] for item in sorted(response['data'], key=lambda d: d['index'])]
+
+def _claim_key(num: Any) -> str:
+    return str(num).strip().lstrip('0') or '0'
+
+
+def parse_consolidated_response(text: str, claims: List[Dict]) -> Tuple[List[str], str, List[str]]:
+    """解析並驗證整合模式的 JSON 回應，格式不符時拋出 ValueError"""
+    start, end = text.find('{'), text.rfind('}')
+    if start < 0 or end < start:
+        raise ValueError('no JSON object in response')
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f'invalid JSON: {str(e)}')
+
+    relevant = data.get('relevant_claims')
+    explanation = data.get('explanation')
+    features = data.get('specific_features')
+    if not isinstance(relevant, list) or not all(isinstance(n, (int, str)) for n in relevant):
+        raise ValueError('relevant_claims must be a list of claim numbers')
+    if not isinstance(explanation, str):
+        raise ValueError('explanation must be a string')
+    if not isinstance(features, list) or not all(isinstance(f, str) for f in features):
+        raise ValueError('specific_features must be a list of strings')
+
+    known = {_claim_key(claim['num']) for claim in claims}
+    wanted = {_claim_key(n) for n in relevant}
+    if not wanted <= known:
+        raise ValueError(f'unknown claim numbers: {sorted(wanted - known)}')
+
+    # 依權利要求原本的順序輸出文字，與逐項分析的格式一致
+    relevant_claims = [claim['text'] for claim in claims if _claim_key(claim['num']) in wanted]
+    return relevant_claims, explanation.strip(), [f.strip('- ').strip() for f in features if f.strip()]
+
+
 @dataclass
 class InfringingProduct:
     product_name: str
@@ -15,51 +256,175 @@ class InfringingProduct:
     specific_features: List[str]
 
 class PatentAnalyzer:
-    def __init__(self, openai_api_key: str , log_level: int = logging.INFO):
+    def __init__(self,
+                 openai_api_key: str,
+                 log_level: int = logging.INFO,
+                 max_workers: int = 4,
+                 max_inflight_calls: int = 8,
+                 claim_batch_size: int = 5,
+                 completion_cache: Optional[CompletionCache] = None,
+                 claim_prefilter: Optional[ClaimPrefilter] = None,
+                 llm_client: Optional[LLMClient] = None,
+                 priority: int = PRIORITY_INTERACTIVE,
+                 consolidated: bool = False,
+                 independent_claims_only: bool = False,
+                 product_store: Optional[ProductAnalysisStore] = None):
         openai.api_key = openai_api_key
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(log_level)
 
-    def _get_relevant_claims(self, patent: Patent, product_description: str) -> List[str]:
-        """分析產品描述與專利權利要求的相關性"""
-        claims = json.loads(patent.claims)
-        
-        BATCH_SIZE = 5
-        claim_batches = [claims[i:i + BATCH_SIZE] for i in range(0, len(claims), BATCH_SIZE)]
+        # 產品層級與 API 呼叫層級使用不同的執行緒池，
+        # 產品任務會等待子呼叫，共用同一個池會造成死結
+        self.max_workers = max(1, max_workers)
+        self.max_inflight_calls = max(1, max_inflight_calls)
+        self.claim_batch_size = max(1, claim_batch_size)
+        self._product_executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='analyze-product')
+        self._call_executor = ThreadPoolExecutor(max_workers=self.max_inflight_calls,
+                                                 thread_name_prefix='analyze-call')
+        self.completion_cache = completion_cache
+        self.claim_prefilter = claim_prefilter
+        self.llm_client = llm_client if llm_client is not None else LLMClient(api_key=openai_api_key)
+        self.priority = priority
+        self._priority_variants = {}
+        # 整合模式：每個產品只發一次 JSON 結構化請求
+        self.consolidated = consolidated
+        # 只分析獨立項，附屬項範圍已被其獨立項涵蓋
+        self.independent_claims_only = independent_claims_only
+        # 已分析過的產品結果，跨報告重複使用
+        self.product_store = product_store
+
+        # 已解析的權利要求，同一專利跨產品、跨公司重複使用
+        self._claims_cache = OrderedDict()
+        self._claims_cache_lock = threading.Lock()
+        self._claims_cache_size = 256
+
+    def with_priority(self, priority: int) -> 'PatentAnalyzer':
+        """回傳共用快取與 LLM client、但以指定優先順序送出請求的 analyzer
+
+        另外配置執行緒池，避免批次工作佔滿呼叫池而卡住互動請求。
+        """
+        if priority == self.priority:
+            return self
+        with self._claims_cache_lock:
+            analyzer = self._priority_variants.get(priority)
+            if analyzer is None:
+                analyzer = copy.copy(self)
+                analyzer.priority = priority
+                analyzer._product_executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=f'analyze-product-p{priority}')
+                analyzer._call_executor = ThreadPoolExecutor(
+                    max_workers=self.max_inflight_calls, thread_name_prefix=f'analyze-call-p{priority}')
+                self._priority_variants[priority] = analyzer
+        return analyzer
+
+    def _product_key(self, patent: PatentSnapshot, product: Dict) -> str:
+        """產品分析結果的快取鍵：產品內容、專利版本與會影響結果的設定"""
+        prefilter = self.claim_prefilter
+        payload = json.dumps({
+            'product_name': product['name'],
+            'product_description': product['description'],
+            'patent_content_hash': patent.content_hash,
+            'patent_updated_at': patent.updated_at.isoformat() if patent.updated_at else None,
+            'consolidated': self.consolidated,
+            'independent_claims_only': self.independent_claims_only,
+            'claim_batch_size': self.claim_batch_size,
+            'prefilter': [prefilter.embedder.name, prefilter.top_k, prefilter.threshold] if prefilter else None
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _complete(self,
+                  prompt: str,
+                  max_tokens: int,
+                  temperature: float,
+                  model: str = "gpt-3.5-turbo-instruct") -> str:
+        """呼叫 completion API，相同參數的請求直接使用快取結果"""
+        cache_key = None
+        if self.completion_cache is not None:
+            cache_key = make_cache_key(model, prompt, max_tokens=max_tokens, temperature=temperature)
+            cached = self.completion_cache.get(cache_key)
+            metrics.count_cache('completion', cached is not None)
+            if cached is not None:
+                return cached
+
+        text = self.llm_client.complete(prompt, max_tokens, temperature, model, priority=self.priority)
+
+        if cache_key is not None:
+            self.completion_cache.set(cache_key, text)
+        return text
+
+    def _screen_claim_batch(self, batch: List[Dict], product_description: str) -> List[str]:
+        """判斷單一批次中哪些權利要求與產品相關"""
+        # 構建批次處理的prompt
+        claims_text = "\n".join([
+            f"Claim {claim['num']}: {claim['text']}"
+            for claim in batch
+        ])
 
-        relevant_claims = []
+        prompt = f"""
+        Analyze if the product potentially infringes each of the following patent claims.
+        Respond with ONLY a comma-separated list of YES or NO for each claim in order.
+
+        Product description: {product_description}
+ 
+        Claims to analyze:
+        {claims_text}
+        """
 
-        for batch in claim_batches:
-            # 構建批次處理的prompt
-            claims_text = "\n".join([
-                f"Claim {claim['num']}: {claim['text']}"
-                for claim in batch
-            ])
+        response_text = self._complete(prompt, max_tokens=60, temperature=0.3)
+
+        # 解析回應
+        results = [r.strip().upper() for r in response_text.split(',')]
+
+        return [claim['text'] for claim, result in zip(batch, results) if 'YES' in result]
+
+    def _load_claims(self, patent: PatentSnapshot) -> List[Dict]:
+        """取得結構化的權利要求，結果依專利版本快取"""
+        key = (patent.publication_number, patent.updated_at, patent.content_hash)
+        with self._claims_cache_lock:
+            claims = self._claims_cache.get(key)
+            metrics.count_cache('claims', claims is not None)
+            if claims is not None:
+                self._claims_cache.move_to_end(key)
+                return claims
+
+        # 匯入時已存為 JSONB；舊資料可能仍是 JSON 字串或缺少 independent 標記
+        claims = normalize_claims(patent.claims)
+
+        with self._claims_cache_lock:
+            self._claims_cache[key] = claims
+            while len(self._claims_cache) > self._claims_cache_size:
+                self._claims_cache.popitem(last=False)
+        return claims
+
+    def _candidate_claims(self, patent: PatentSnapshot, product_description: str) -> List[Dict]:
+        """取得要送給 LLM 判斷的權利要求"""
+        claims = self._load_claims(patent)
+        if self.independent_claims_only:
+            claims = [claim for claim in claims if claim['independent']]
+        # 先以向量相似度排除明顯無關的權利要求
+        if self.claim_prefilter is not None:
+            with metrics.span('prefilter'):
+                claims = self.claim_prefilter.select(claims, product_description)
+        return claims
+
+    @metrics.timed('screen_claims')
+    def _get_relevant_claims(self, patent: PatentSnapshot, product_description: str) -> List[str]:
+        """分析產品描述與專利權利要求的相關性"""
+        claims = self._candidate_claims(patent, product_description)
 
-            prompt = f"""
-            Analyze if the product potentially infringes each of the following patent claims.
-            Respond with ONLY a comma-separated list of YES or NO for each claim in order.
+        batch_size = self.claim_batch_size
+        claim_batches = [claims[i:i + batch_size] for i in range(0, len(claims), batch_size)]
 
-            Product description: {product_description}
- 
-            Claims to analyze:
-            {claims_text}
-            """
-
-            response = openai.Completion.create( 
-                model="gpt-3.5-turbo-instruct",
-                prompt=prompt,
-                max_tokens=60,
-                temperature=0.3
-            )
-
-            # 解析回應
-            results = [r.strip().upper() for r in response.choices[0].text.split(',')]
-        
-            # 將相關的claims加入結果
-            for claim, result in zip(batch, results):
-                if 'YES' in result:
-                    relevant_claims.append(claim['text'])
+        # 各批次同時送出，依批次順序取回結果，保持權利要求原本的順序
+        batch_futures = [
+            metrics.submit(self._call_executor, self._screen_claim_batch, batch, product_description)
+            for batch in claim_batches
+        ]
+
+        relevant_claims = []
+        for future in batch_futures:
+            relevant_claims.extend(future.result())
 
         return relevant_claims
 
@@ -71,8 +436,9 @@ class PatentAnalyzer:
             return "Moderate"
         return "Low"
 
+    @metrics.timed('explanation')
     def _generate_explanation(self,
-                              patent: Patent,
+                              patent: PatentSnapshot,
                               product_name: str,
                               product_description: str,
                               relevant_claims: List[str],) -> str:
@@ -88,18 +454,14 @@ class PatentAnalyzer:
         Format the explanation in 2-3 sentences focusing on specific technical similarities.
         """
 
-        response = openai.Completion.create( 
-            model="gpt-3.5-turbo-instruct",
-            prompt=prompt,
-            max_tokens=200,
-            temperature=0.7
-        )
+        response_text = self._complete(prompt, max_tokens=200, temperature=0.7)
 
-        return response.choices[0].text.strip()
+        return response_text.strip()
     
+    @metrics.timed('features')
     def _extract_specific_features(self,
                                    product_description: str,
-                                   patent: Patent) -> List[str]:
+                                   patent: PatentSnapshot) -> List[str]:
         """提取產品中可能侵權的具體特徵"""
         prompt = f"""
         List 3-5 specific technical features from the product that might infringe the patent.
@@ -111,21 +473,80 @@ class PatentAnalyzer:
         Format as a simple list of features, one per line.
         """
 
-        response = openai.Completion.create(
-            model="gpt-3.5-turbo-instruct",
-            prompt=prompt,
-            max_tokens=150,
-            temperature=0.5
-        )
+        response_text = self._complete(prompt, max_tokens=150, temperature=0.5)
 
-        features = response.choices[0].text.strip().split('\n')
+        features = response_text.strip().split('\n')
         return [f.strip('- ') for f in features]
 
+    @metrics.timed('consolidated')
+    def _analyze_product_consolidated(self,
+                                      patent: PatentSnapshot,
+                                      product_name: str,
+                                      product_description: str) -> InfringingProduct:
+        """以單一 JSON 結構化請求取得相關權利要求、說明與特徵"""
+        claims = self._candidate_claims(patent, product_description)
+        claims_text = "\n".join([
+            f"Claim {claim['num']}: {claim['text']}"
+            for claim in claims
+        ])
+
+        prompt = f"""
+        Analyze whether the product potentially infringes the patent.
+
+        Product: {product_name}
+        Product description: {product_description}
+        Patent title: {patent.title}
+        Patent abstract: {patent.abstract}
+
+        Claims:
+        {claims_text}
+
+        Respond with ONLY a JSON object with these keys:
+        "relevant_claims": list of the claim numbers the product potentially infringes,
+        "explanation": 2-3 sentences on the specific technical similarities,
+        "specific_features": list of 3-5 specific technical features of the product that might infringe.
+        """
+
+        # 權利要求太多時整合請求放不下，拋出 ValueError 讓呼叫端改用逐項分析
+        max_tokens = 400 + 10 * len(claims)
+        estimated = estimate_tokens(prompt, max_tokens)
+        if estimated > COMPLETION_CONTEXT_TOKENS * CONTEXT_SAFETY_RATIO:
+            raise ValueError(f'prompt of about {estimated} tokens exceeds the context window')
+
+        try:
+            response_text = metrics.submit(
+                self._call_executor, self._complete, prompt, max_tokens, 0.3).result()
+        except Exception as e:
+            if _is_context_length_error(e):
+                raise ValueError(f'context length exceeded: {str(e)}')
+            raise
+        relevant_claims, explanation, specific_features = parse_consolidated_response(response_text, claims)
+
+        return InfringingProduct(
+            product_name=product_name,
+            infringement_likelihood=self._analyze_infringement_level(len(relevant_claims)),
+            relevant_claims=relevant_claims,
+            explanation=explanation,
+            specific_features=specific_features
+        )
+
+    @metrics.timed('product')
     def analyze_product(self,
-                        patent: Patent,
+                        patent: PatentSnapshot,
                         product_name: str,
                         product_description: str) -> InfringingProduct:
         """分析單個產品的侵權情況"""
+        if self.consolidated:
+            try:
+                return self._analyze_product_consolidated(patent, product_name, product_description)
+            except ValueError as e:
+                # 回應不符合格式或 prompt 過長時改用逐項分析
+                self.logger.warning(f'Consolidated analysis of {product_name} failed ({str(e)}), falling back')
+
+        # 特徵提取不依賴權利要求結果，先丟到背景執行
+        features_future = metrics.submit(
+            self._call_executor, self._extract_specific_features, product_description, patent)
+
         # 1. 找出相關的權利要求
         relevant_claims = self._get_relevant_claims(patent, product_description)
         # 2. 判斷親權程度
@@ -133,7 +554,7 @@ class PatentAnalyzer:
         # 3. 生成解釋說明
         explanation = self._generate_explanation(patent, product_name, product_description, relevant_claims)
         # 4. 提取具體特徵
-        specific_features = self._extract_specific_features(product_description, patent)
+        specific_features = features_future.result()
 
         return InfringingProduct(
             product_name=product_name,
@@ -145,20 +566,89 @@ class PatentAnalyzer:
 
     def generate_infringement_report(self,
                                      patent_id: str,
-                                     company_name: str) -> Optional[Dict]:
-        """生成完整的侵權分析報告"""
-        patent = Patent.query.filter_by(publication_number=patent_id).first()
-        company = Company.query.filter_by(name=company_name).first()
+                                     company_name: str,
+                                     progress_callback: Optional[Callable[[int, int], None]] = None) -> Optional[Dict]:
+        """生成完整的侵權分析報告，progress_callback(已完成產品數, 產品總數)"""
+        report = None
+        for event, data in self.iter_infringement_report(patent_id, company_name, progress_callback):
+            if event == 'report':
+                report = data
+        return report
+
+    def iter_infringement_report(self,
+                                 patent_id: str,
+                                 company_name: str,
+                                 progress_callback: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[str, Any]]:
+        """逐步產生分析結果：每個產品完成即送出，最後是排名、風險評估與完整報告
+
+        事件依序為 ("product", InfringingProduct)、("top_products", List[InfringingProduct])、
+        ("risk_assessment", str)、("report", Dict)；專利或公司不存在時不產生任何事件。
+        """
+        # 讀取快取的快照，熱門專利與公司不必再查詢資料庫
+        with metrics.span('lookup'):
+            patent = get_patent(patent_id)
+            company = get_company(company_name)
 
         if not patent or not company:
-            return None
+            return
+
+        yield from self.iter_report_for(patent, company, progress_callback)
 
-        # 分析所有產品 
-        product_analysis = []
-        #product = company.products[0]
-        for product in company.products:
-            analysis = self.analyze_product(patent, product['name'], product['description'])
-            product_analysis.append(analysis)
+    def iter_report_for(self,
+                        patent: PatentSnapshot,
+                        company: CompanySnapshot,
+                        progress_callback: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[str, Any]]:
+        """與 iter_infringement_report 相同，但直接使用傳入的專利與公司
+
+        設定 product_store 時，先一次讀回已分析過的產品，只分析新的或內容有變動的產品，
+        新結果在呼叫端的執行緒寫回（需要 app context）。
+        """
+        products = company.products or []
+        product_analysis = [None] * len(products)
+
+        product_keys = []
+        if self.product_store is not None:
+            product_keys = [self._product_key(patent, product) for product in products]
+            with metrics.span('product_store'):
+                stored = self.product_store.get_many(patent.publication_number, product_keys)
+            for index, key in enumerate(product_keys):
+                if key in stored:
+                    product_analysis[index] = InfringingProduct(**stored[key])
+            missing = product_analysis.count(None)
+            metrics.count_cache('product', True, len(products) - missing)
+            metrics.count_cache('product', False, missing)
+
+        futures = {
+            metrics.submit(self._product_executor, self.analyze_product,
+                           patent, product['name'], product['description']): index
+            for index, product in enumerate(products)
+            if product_analysis[index] is None
+        }
+
+        # 先送出已存的結果，再分析其餘產品，完成一個送出一個；報告內仍依 company.products 的順序排列
+        completed = 0
+        for analysis in product_analysis:
+            if analysis is not None:
+                completed += 1
+                if progress_callback is not None:
+                    progress_callback(completed, len(products))
+                yield 'product', analysis
+        try:
+            for future in as_completed(futures):
+                analysis = future.result()
+                index = futures[future]
+                product_analysis[index] = analysis
+                if product_keys:
+                    self.product_store.put(patent.publication_number, product_keys[index],
+                                           analysis.product_name, asdict(analysis))
+                completed += 1
+                if progress_callback is not None:
+                    progress_callback(completed, len(products))
+                yield 'product', analysis
+        finally:
+            # 呼叫端中途停止讀取時，取消尚未開始的產品
+            for future in futures:
+                future.cancel()
 
         # 選出侵權可能性最高的兩個產品
         top_products = sorted(
@@ -169,6 +659,7 @@ class PatentAnalyzer:
             ),
             reverse=True
         )[:2]
+        yield 'top_products', top_products
 
         all_products_list = "\n".join([p.product_name for p in product_analysis])
 
@@ -193,28 +684,16 @@ class PatentAnalyzer:
         Format the assessment in 2-3 sentences.
         """
 
-        risk_response = openai.Completion.create(
-            model="gpt-3.5-turbo-instruct",
-            prompt=risk_prompt,
-            max_tokens=200,
-            temperature=0.7
-        )
+        with metrics.span('risk_assessment'):
+            risk_assessment = self._complete(risk_prompt, max_tokens=200, temperature=0.7).strip()
+        yield 'risk_assessment', risk_assessment
 
-        return {
+        yield 'report', {
             "analysis_id": str(hash(datetime.now().isoformat())),
             "patent_id": patent.publication_number,
             "patent_title": patent.title,
             "company_name": company.name,
             "analysis_date": datetime.now().strftime("%Y-%m-%d"),
-            "top_infringing_products": [
-                {
-                    "product_name": p.product_name,
-                    "infringement_likelihood": p.infringement_likelihood,
-                    "relevant_claims": p.relevant_claims,
-                    "explanation": p.explanation,
-                    "specific_features": p.specific_features
-                }
-                for p in top_products
-            ],
-            "overall_risk_assessment": risk_response.choices[0].text.strip()
-        }
\ No newline at end of file
+            "top_infringing_products": [asdict(p) for p in top_products],
+            "overall_risk_assessment": risk_assessment
+        }
@@ -1,11 +1,25 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, Response, request, jsonify, make_response, stream_with_context
 from flask_cors import CORS  
-from models import db, Patent, Company, Report
+from flask_compress import Compress
+from models import db, Patent, Report, ReportProduct
 from os import environ
-from analysis import PatentAnalyzer
+from analysis import LLMClient, PatentAnalyzer
+from llm_cache import CompletionCache
+from embeddings import ClaimPrefilter
+from product_store import ProductAnalysisStore
+from reports import find_report, find_report_json, get_or_create_report, get_report_json, stream_report
+from jobs import AnalysisJob, JobManager, JOB_COMPLETED
+from http_cache import conditional
+from json_provider import FastJSONProvider
+import metrics
+from catalog import catalog_cache, get_patent_detail, list_companies, list_patents
 import traceback
 import logging
 from functools import wraps
+from sqlalchemy import func, or_, text
+import json
+import re
+import threading
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -13,19 +27,95 @@ logger = logging.getLogger(__name__)
 
 # Create the Flask app
 app = Flask(__name__)
+# orjson-backed jsonify, falling back to the stdlib json module
+app.json = FastJSONProvider(app)
 
-# Enable CORS for all routes
-CORS(app)
+# Enable CORS for all routes; let browsers read the paging and caching headers
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Next-Offset', 'ETag', 'Content-Location'])
+
+# Compress responses (gzip/brotli); the SSE stream must not be buffered
+app.config['COMPRESS_STREAMS'] = False
+Compress(app)
+
+# Request latency histograms and the optional Server-Timing breakdown
+metrics.init_app(app)
 
 # Set up the database
 app.config['SQLALCHEMY_DATABASE_URI'] = environ.get('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Each worker process keeps its own pool; size it for the worker's threads plus background jobs
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(environ.get('DB_POOL_SIZE', 10)),
+    'max_overflow': int(environ.get('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': int(environ.get('DB_POOL_TIMEOUT', 30)),
+    'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': True
+}
 
 # Initialize the database
 db.init_app(app)
 
-# Initialize the PatentAnalyzer
-analyzer = PatentAnalyzer(openai_api_key=environ.get('OPENAI_API_KEY'))
+# Cheap fingerprints of the rows behind cacheable responses, used as ETag inputs
+def table_version(model):
+    return db.session.query(func.max(model.id), func.max(model.updated_at)).one()
+
+# Import version of a table as seen by the catalog cache; no query while it is fresh
+def catalog_version(table):
+    return lambda *args, **kwargs: catalog_cache.version(table)
+
+def report_version(report_id):
+    return db.session.query(Report.updated_at).filter_by(id=report_id).first()
+
+# Stored reports are returned as the JSON text Postgres produces, without re-encoding
+def json_text_response(json_text, status=200):
+    return app.response_class(json_text, status=status, mimetype='application/json')
+
+# Page sizes for list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# ?limit= clamped to 1..MAX_PAGE_SIZE; a zero or negative limit would break the next-page headers
+def page_limit():
+    return max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+
+# The PatentAnalyzer and job pool are built on first use, so every gunicorn
+# worker gets its own thread pools and rate limiter after the fork
+analyzer = None
+job_manager = None
+_init_lock = threading.Lock()
+
+def get_analyzer():
+    global analyzer
+    if analyzer is None:
+        with _init_lock:
+            if analyzer is None:
+                llm_client = LLMClient.from_env(api_key=environ.get('OPENAI_API_KEY'))
+                analyzer = PatentAnalyzer(
+                    openai_api_key=environ.get('OPENAI_API_KEY'),
+                    max_workers=int(environ.get('ANALYSIS_MAX_WORKERS', 4)),
+                    max_inflight_calls=int(environ.get('ANALYSIS_MAX_INFLIGHT_CALLS', 8)),
+                    claim_batch_size=int(environ.get('ANALYSIS_CLAIM_BATCH_SIZE', 5)),
+                    completion_cache=CompletionCache.from_env(),
+                    claim_prefilter=ClaimPrefilter.from_env(llm_client),
+                    llm_client=llm_client,
+                    consolidated=environ.get('ANALYSIS_MODE', 'standard') == 'consolidated',
+                    independent_claims_only=environ.get('ANALYSIS_INDEPENDENT_CLAIMS_ONLY', '').lower() in ('1', 'true'),
+                    product_store=ProductAnalysisStore.from_env()
+                )
+    return analyzer
+
+def get_job_manager():
+    global job_manager
+    if job_manager is None:
+        analysis = get_analyzer()
+        with _init_lock:
+            if job_manager is None:
+                job_manager = JobManager(app, analysis,
+                                         max_workers=int(environ.get('ANALYSIS_JOB_WORKERS', 2)),
+                                         batch_workers=int(environ.get('BATCH_WORKERS', 4)),
+                                         batch_job_workers=int(environ.get('BATCH_JOB_WORKERS', 1)),
+                                         stale_after=float(environ.get('ANALYSIS_JOB_STALE_SECONDS', 3600)))
+    return job_manager
 
 #def log_endpoint(f):
 #    @wraps(f)
@@ -51,6 +141,11 @@ analyzer = PatentAnalyzer(openai_api_key=environ.get('OPENAI_API_KEY'))
 def test():
   return jsonify({'message': 'The server is running'})
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    body, content_type = metrics.render()
+    return Response(body, mimetype=content_type)
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze_patent():
     try:
@@ -72,39 +167,28 @@ def analyze_patent():
 
         logger.debug(f"Received request - patent_id: {patent_id}, company_name: {company_name}")
 
-        reportRecord = Report.query.filter_by(patent_publication_number=patent_id,company_name=company_name).first()
-        if not reportRecord:
+        stored = find_report_json(patent_id, company_name)
+        if stored:
+            logger.debug("Report already exists")
+            report_id, report_json = stored
+            response = json_text_response(report_json)
+            # Point clients at the conditional GET endpoint for later revalidation
+            response.headers['Content-Location'] = f'/api/reports/{report_id}'
+            return response
 
-            logger.debug("Calling analyzer.generate_infringement_report")
-            report = analyzer.generate_infringement_report(
-                patent_id,
-                company_name
-            )
+        # Job mode: return immediately and let the worker pool run the analysis
+        if data.get('async') or request.args.get('async') in ('1', 'true'):
+            job = get_job_manager().submit(patent_id, company_name)
+            logger.debug(f"Queued analysis job {job.job_id}")
+            return make_response(jsonify(job.to_dict()), 202)
 
-            if not report:
-                logger.warning("No report generated by analyzer")
-                return make_response(jsonify({
-                    'message': 'No report generated'
-                }), 404)
-            logger.debug("Successfully generated report")
-
-            reportRecord = Report(
-                patent_publication_number=patent_id,
-                company_name=company_name,
-                analysis_data=report
-            )
-            db.session.add(reportRecord)
-            try:
-                db.session.commit()
-                logger.info('reportRecord imported successfully')
-            except Exception as e:
-                db.session.rollback()
-                logger.error(f'Error importing reportRecord: {str(e)}')
-
-            return make_response(jsonify(report), 200)
-        else:
-            logger.debug("Report already exists")
-            return make_response(reportRecord.analysis_data, 200)
+        report = get_or_create_report(get_analyzer(), patent_id, company_name)
+        if not report:
+            return make_response(jsonify({
+                'message': 'No report generated'
+            }), 404)
+
+        return make_response(jsonify(report), 200)
 
     except Exception as e:
         return make_response(jsonify({
@@ -112,56 +196,224 @@ def analyze_patent():
         }), 500)
 
 
+@app.route('/api/analyze/stream', methods=['GET', 'POST'])
+def analyze_patent_stream():
+    # GET lets browsers use EventSource, which cannot send a body
+    data = request.get_json(silent=True) if request.method == 'POST' else request.args
+    data = data or {}
+    patent_id = data.get('patent_id')
+    company_name = data.get('company_name')
+
+    if not patent_id or not company_name:
+        logger.warning("Missing required parameters")
+        return make_response(jsonify({
+            'message': 'Missing required parameters'
+        }), 400)
+
+    def generate():
+        try:
+            for event, payload in stream_report(get_analyzer(), patent_id, company_name):
+                yield f"event: {event}\ndata: {app.json.dumps(payload)}\n\n"
+        except Exception as e:
+            logger.error(f"Exception occurred: {str(e)}")
+            logger.error(traceback.format_exc())
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def is_id_list(values):
+    return isinstance(values, list) and bool(values) \
+        and all(isinstance(value, str) and value.strip() for value in values)
+
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    try:
+        data = request.get_json()
+        if data is None:
+            return make_response(jsonify({
+                'message': 'No JSON data in request'
+            }), 400)
+
+        patent_ids = data.get('patent_ids')
+        company_names = data.get('company_names')
+        if not is_id_list(patent_ids) or not is_id_list(company_names):
+            logger.warning("Missing required parameters")
+            return make_response(jsonify({
+                'message': 'patent_ids and company_names must be non-empty lists of non-empty strings'
+            }), 400)
+
+        job = get_job_manager().submit_batch(patent_ids, company_names)
+        logger.debug(f"Queued batch job {job.job_id}")
+        return make_response(jsonify(job.to_dict()), 202)
+    except Exception as e:
+        return make_response(jsonify({
+            'error': str(e)
+        }), 500)
+
+
+@app.route('/api/analyze/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    try:
+        job = get_job_manager().get(job_id)
+        if not job:
+            return make_response(jsonify({
+                'message': 'job not found'
+            }), 404)
+
+        job_data = job.to_dict()
+        if isinstance(job, AnalysisJob) and job.status == JOB_COMPLETED:
+            reportRecord = find_report(job.patent_id, job.company_name)
+            job_data['report'] = reportRecord.analysis_data if reportRecord else None
+
+        return make_response(jsonify(job_data), 200)
+    except Exception as e:
+        return make_response(jsonify({
+            'error': str(e)
+        }), 500)
+
+
 @app.route('/api/patents', methods=['GET'])
+@conditional(catalog_version('patents'))
 def get_patents():
     try:
-        patents = Patent.query.all()
+        limit = page_limit()
+        cursor = request.args.get('cursor')
+        prefix = request.args.get('prefix')
+
+        # Only select the listed columns and page by publication_number (keyset)
+        rows = list_patents(limit, cursor=cursor, prefix=prefix)
+
         patents_data = [{
-            'publication_number': patent.publication_number,
-            'title': patent.title
-            } for patent in patents
+            'publication_number': publication_number,
+            'title': title
+            } for publication_number, title in rows[:limit]
         ]
-        return jsonify(patents_data), 200
+        response = make_response(jsonify(patents_data), 200)
+        if len(rows) > limit:
+            response.headers['X-Next-Cursor'] = rows[limit - 1][0]
+        return response
     except Exception as e:
         return make_response(jsonify({'message': 'error getting patents', 'error': str(e)}), 500)
 
+@app.route('/api/patents/search', methods=['GET'])
+@conditional(lambda: table_version(Patent))
+def search_patents():
+    try:
+        q = (request.args.get('q') or '').strip()
+        words = re.findall(r'\w+', q)
+        if not words:
+            return make_response(jsonify({
+                'message': 'Missing search query'
+            }), 400)
+
+        limit = page_limit()
+        offset = max(request.args.get('offset', 0, type=int), 0)
+
+        # Every word must match, the last one as a prefix so partial input still hits
+        ts_query = func.to_tsquery('english', ' & '.join(words[:-1] + [words[-1] + ':*']))
+        rank = func.ts_rank_cd(Patent.search_vector, ts_query)
+        similarity = func.similarity(Patent.title, q)
+
+        rows = db.session.query(Patent.publication_number, Patent.title, rank, similarity) \
+            .filter(or_(Patent.search_vector.op('@@')(ts_query), Patent.title.op('%')(q))) \
+            .order_by(rank.desc(), similarity.desc(), Patent.publication_number) \
+            .offset(offset).limit(limit + 1).all()
+
+        results = [{
+            'publication_number': publication_number,
+            'title': title,
+            'rank': float(rank_value),
+            'similarity': float(similarity_value)
+            } for publication_number, title, rank_value, similarity_value in rows[:limit]
+        ]
+        response = make_response(jsonify(results), 200)
+        if len(rows) > limit:
+            response.headers['X-Next-Offset'] = str(offset + limit)
+        return response
+    except Exception as e:
+        return make_response(jsonify({'message': 'error searching patents', 'error': str(e)}), 500)
+
+@app.route('/api/reports', methods=['GET'])
+def get_reports():
+    try:
+        limit = page_limit()
+        cursor = request.args.get('cursor', type=int)
+        company_name = request.args.get('company_name')
+        patent_id = request.args.get('patent_id')
+        likelihood = request.args.get('likelihood')
+        min_claims = request.args.get('min_relevant_claims', type=int)
+
+        # Newest first, paged by id (keyset) so every filter stays on an index
+        query = ReportProduct.query
+        if company_name:
+            query = query.filter(ReportProduct.company_name == company_name)
+        if patent_id:
+            query = query.filter(ReportProduct.patent_publication_number == patent_id)
+        if likelihood:
+            query = query.filter(ReportProduct.infringement_likelihood == likelihood)
+        if min_claims is not None:
+            query = query.filter(ReportProduct.relevant_claim_count >= min_claims)
+        if cursor:
+            query = query.filter(ReportProduct.id < cursor)
+        rows = query.order_by(ReportProduct.id.desc()).limit(limit + 1).all()
+
+        products_data = [{
+            'report_id': row.report_id,
+            'patent_id': row.patent_publication_number,
+            'company_name': row.company_name,
+            'product_name': row.product_name,
+            'infringement_likelihood': row.infringement_likelihood,
+            'relevant_claim_count': row.relevant_claim_count,
+            'created_at': row.created_at.isoformat() if row.created_at else None
+            } for row in rows[:limit]
+        ]
+        response = make_response(jsonify(products_data), 200)
+        if len(rows) > limit:
+            response.headers['X-Next-Cursor'] = str(rows[limit - 1].id)
+        return response
+    except Exception as e:
+        return make_response(jsonify({'message': 'error getting reports', 'error': str(e)}), 500)
+
+@app.route('/api/reports/<int:report_id>', methods=['GET'])
+@conditional(report_version, max_age=3600)
+def get_report(report_id):
+    try:
+        report_json = get_report_json(report_id)
+        if report_json is None:
+            return make_response(jsonify({
+                'message': 'report not found'
+                }), 404)
+        return json_text_response(report_json)
+    except Exception as e:
+        return make_response(jsonify({
+            'error': str(e)
+            }), 500)
+
 @app.route('/api/companies', methods=['GET'])
+@conditional(catalog_version('companies'))
 def get_companies():
     try:
-        companies = Company.query.all()
-        companies_data = [{
-            'id': company.id,
-            'name': company.name,
-            'products': company.products
-            } for company in companies
-        ]
-        return jsonify(companies_data), 200
+        return jsonify(list_companies()), 200
     except Exception as e:
         return make_response(jsonify({'message': 'error getting companies', 'error': str(e)}), 500)
 
 @app.route('/api/patent/<id>', methods=['GET'])
+@conditional(catalog_version('patents'), max_age=3600)
 def get_patent_details(id):
     try:
-        patent = Patent.query.filter_by(publication_number=id).first()
+        patent = get_patent_detail(id)
         if not patent:
             return make_response(jsonify({
                 'message': 'patent not found'
                 }), 404)
 
-        return make_response(jsonify({
-            'publication_number': patent.publication_number,
-            'title': patent.title,
-            'abstract': patent.abstract,
-            'description': patent.description,
-            'assignee': patent.assignee,
-            'inventors': patent.inventors,
-            'priority_date': patent.priority_date,
-            'application_date': patent.application_date,
-            'grant_date': patent.grant_date,
-            'claims': patent.claims,
-            'jurisdictions': patent.jurisdictions,
-            'classifications': patent.classifications
-            }), 200)
+        return make_response(jsonify(patent), 200)
     except Exception as e:
         return make_response(jsonify({
             'error': str(e)
@@ -170,5 +422,8 @@ def get_patent_details(id):
 
 if __name__ == '__main__':
     with app.app_context():
+        # The trigram index on patents.title needs pg_trgm
+        db.session.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        db.session.commit()
         db.create_all()
     app.run(debug=False)
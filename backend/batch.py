@@ -0,0 +1,104 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from models import db, Report
+from reports import get_or_create_report
+from analysis import PRIORITY_BATCH
+import logging
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchStats:
+    total_pairs: int = 0
+    skipped_pairs: int = 0
+    completed_pairs: int = 0
+    failed_pairs: int = 0
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self) -> Dict:
+        done = self.completed_pairs + self.failed_pairs
+        return {
+            'total_pairs': self.total_pairs,
+            'skipped_pairs': self.skipped_pairs,
+            'completed_pairs': self.completed_pairs,
+            'failed_pairs': self.failed_pairs,
+            'remaining_pairs': self.total_pairs - self.skipped_pairs - done,
+            'elapsed_seconds': round(self.elapsed, 1),
+            'pairs_per_minute': round(done / self.elapsed * 60, 2) if self.elapsed else 0.0
+        }
+
+
+def pending_pairs(patent_ids: List[str], company_names: List[str]) -> Tuple[List[Tuple[str, str]], int]:
+    """Return the (patent, company) pairs without a stored report, and how many were skipped"""
+    existing = set(
+        db.session.query(Report.patent_publication_number, Report.company_name)
+        .filter(Report.patent_publication_number.in_(patent_ids),
+                Report.company_name.in_(company_names))
+        .all()
+    )
+    # Patent-major order keeps per-patent caches (parsed claims, embeddings) warm
+    pairs = [(patent_id, company_name)
+             for patent_id in patent_ids
+             for company_name in company_names
+             if (patent_id, company_name) not in existing]
+    return pairs, len(existing)
+
+
+class BatchRunner:
+    """Analyze many patents against many companies over a bounded worker pool"""
+
+    def __init__(self, app, analyzer, max_workers: int = 4):
+        self.app = app
+        # Batch calls yield to interactive requests at the rate limiter
+        self.analyzer = analyzer.with_priority(PRIORITY_BATCH)
+        self.max_workers = max(1, max_workers)
+
+    def _analyze_pair(self, patent_id: str, company_name: str) -> bool:
+        with self.app.app_context():
+            # get_or_create_report commits each report as soon as it is ready
+            return get_or_create_report(self.analyzer, patent_id, company_name) is not None
+
+    def run(self,
+            patent_ids: List[str],
+            company_names: List[str],
+            stats: Optional[BatchStats] = None,
+            on_progress: Optional[Callable[[BatchStats], None]] = None) -> BatchStats:
+        stats = stats if stats is not None else BatchStats()
+        patent_ids = list(dict.fromkeys(patent_ids))
+        company_names = list(dict.fromkeys(company_names))
+
+        with self.app.app_context():
+            pairs, skipped = pending_pairs(patent_ids, company_names)
+        stats.total_pairs = len(patent_ids) * len(company_names)
+        stats.skipped_pairs = skipped
+        logger.info(f'Batch analysis: {len(pairs)} pairs to analyze, {skipped} already in reports')
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='batch-pair') as executor:
+            futures = {executor.submit(self._analyze_pair, patent_id, company_name): (patent_id, company_name)
+                       for patent_id, company_name in pairs}
+            for future in as_completed(futures):
+                patent_id, company_name = futures[future]
+                try:
+                    if future.result():
+                        stats.completed_pairs += 1
+                    else:
+                        stats.failed_pairs += 1
+                        logger.warning(f'No report generated for {patent_id} / {company_name}')
+                except Exception as e:
+                    stats.failed_pairs += 1
+                    logger.error(f'Batch analysis of {patent_id} / {company_name} failed: {str(e)}')
+                    logger.error(traceback.format_exc())
+                if on_progress is not None:
+                    on_progress(stats)
+
+        stats.finished_at = time.time()
+        return stats
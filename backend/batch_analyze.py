@@ -0,0 +1,60 @@
+import argparse
+from app import app, get_analyzer
+from batch import BatchRunner
+from models import Company, Patent
+
+
+def read_ids(values):
+    """Expand @file arguments into one id per line"""
+    ids = []
+    for value in values or []:
+        if value.startswith('@'):
+            with open(value[1:], 'r', encoding='utf-8') as file:
+                ids.extend(line.strip() for line in file if line.strip())
+        else:
+            ids.append(value)
+    return ids
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Analyze many patents against many companies')
+    parser.add_argument('--patents', nargs='*', help='patent publication numbers, or @file with one per line')
+    parser.add_argument('--companies', nargs='*', help='company names, or @file with one per line')
+    parser.add_argument('--all-patents', action='store_true', help='analyze every patent in the database')
+    parser.add_argument('--all-companies', action='store_true', help='analyze against every company in the database')
+    parser.add_argument('--workers', type=int, default=4, help='pairs analyzed concurrently')
+    return parser.parse_args()
+
+
+def print_progress(stats):
+    progress = stats.to_dict()
+    done = progress['completed_pairs'] + progress['failed_pairs']
+    print(f"  {done}/{progress['total_pairs'] - progress['skipped_pairs']} pairs "
+          f"({progress['failed_pairs']} failed, {progress['pairs_per_minute']} pairs/min, "
+          f"{progress['elapsed_seconds']}s elapsed)")
+
+
+def main():
+    args = parse_args()
+    with app.app_context():
+        patent_ids = read_ids(args.patents)
+        company_names = read_ids(args.companies)
+        if args.all_patents:
+            patent_ids = [row[0] for row in Patent.query.with_entities(Patent.publication_number)]
+        if args.all_companies:
+            company_names = [row[0] for row in Company.query.with_entities(Company.name)]
+
+    if not patent_ids or not company_names:
+        print("Error: need at least one patent and one company")
+        return
+
+    print(f"Analyzing {len(patent_ids)} patents against {len(company_names)} companies...")
+    stats = BatchRunner(app, get_analyzer(), max_workers=args.workers).run(
+        patent_ids, company_names, on_progress=print_progress)
+    print_progress(stats)
+    print(f"Batch finished: {stats.completed_pairs} reports stored, "
+          f"{stats.skipped_pairs} already existed, {stats.failed_pairs} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Deterministic stand-in for the OpenAI completion API
+
+FakeCompletion can be passed to LLMClient(completion_fn=...) directly, or
+served over HTTP so a running backend can point OPENAI_API_BASE at it:
+
+    python -m benchmarks.fake_llm --port 8099 --latency 0.2 --error-rate 0.02 --rpm 600
+"""
+from typing import Dict, List, Optional, Tuple
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import openai
+
+CLAIM_LINE = re.compile(r'^\s*Claim (\S+):', re.MULTILINE)
+
+
+def _digest(*parts) -> int:
+    payload = '\0'.join(str(part) for part in parts)
+    return int.from_bytes(hashlib.sha256(payload.encode('utf-8')).digest()[:8], 'little')
+
+
+class FakeCompletion:
+    """Answers each prompt type the analyzer sends with a plausible, repeatable response
+
+    The text depends only on the prompt and seed. Latency, injected errors
+    and the simulated rate limit add the timing behaviour of the real API.
+    """
+
+    def __init__(self,
+                 latency: float = 0.05,
+                 latency_jitter: float = 0.5,
+                 error_rate: float = 0.0,
+                 requests_per_minute: Optional[float] = None,
+                 yes_rate: float = 0.3,
+                 seed: int = 0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.yes_rate = yes_rate
+        self.seed = seed
+        self._random = random.Random(seed)
+        self._window = deque()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.total_tokens = 0
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.calls = self.errors = self.rate_limited = self.total_tokens = 0
+
+    def counters(self) -> Dict:
+        with self._lock:
+            return {'calls': self.calls, 'errors': self.errors,
+                    'rate_limited': self.rate_limited, 'total_tokens': self.total_tokens}
+
+    # -- response text -------------------------------------------------------
+
+    def _yes(self, prompt: str, index: int) -> bool:
+        return _digest(self.seed, prompt, index) % 1000 < self.yes_rate * 1000
+
+    def _sentences(self, prompt: str, count: int) -> str:
+        words = re.findall(r'[A-Za-z]{4,}', prompt) or ['product', 'patent']
+        sentences = []
+        for i in range(count):
+            start = _digest(self.seed, prompt, 'sentence', i) % len(words)
+            picked = [words[(start + j * 7) % len(words)].lower() for j in range(8)]
+            sentences.append(' '.join(picked).capitalize() + '.')
+        return ' '.join(sentences)
+
+    def _features(self, prompt: str) -> List[str]:
+        count = 3 + _digest(self.seed, prompt, 'features') % 3
+        return [self._sentences(f'{prompt}{i}', 1).rstrip('.') for i in range(count)]
+
+    def text_for(self, prompt: str) -> str:
+        if 'comma-separated list of YES or NO' in prompt:
+            claims = CLAIM_LINE.findall(prompt)
+            return ', '.join('YES' if self._yes(prompt, i) else 'NO' for i in range(len(claims)))
+        if '"relevant_claims"' in prompt:
+            claims = CLAIM_LINE.findall(prompt)
+            return json.dumps({
+                'relevant_claims': [num for i, num in enumerate(claims) if self._yes(prompt, i)],
+                'explanation': self._sentences(prompt, 2),
+                'specific_features': self._features(prompt)
+            })
+        if 'specific technical features' in prompt:
+            return '\n'.join(f'- {feature}' for feature in self._features(prompt))
+        return self._sentences(prompt, 2)
+
+    # -- timing and failures -------------------------------------------------
+
+    def _admit(self) -> Tuple[Optional[str], float]:
+        """Return (error kind or None, seconds to sleep) for the next call"""
+        with self._lock:
+            self.calls += 1
+            if self.requests_per_minute:
+                now = time.monotonic()
+                while self._window and now - self._window[0] >= 60:
+                    self._window.popleft()
+                if len(self._window) >= self.requests_per_minute:
+                    self.rate_limited += 1
+                    return 'rate_limit', 60 - (now - self._window[0])
+                self._window.append(now)
+            delay = self.latency * (1 + self.latency_jitter * (self._random.random() * 2 - 1))
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return 'server_error', max(0.0, delay)
+            return None, max(0.0, delay)
+
+    def respond(self, prompt: str, max_tokens: int) -> Tuple[int, Dict, Dict]:
+        """Simulate one request and return (HTTP status, JSON body, headers)"""
+        error, delay = self._admit()
+        if error == 'rate_limit':
+            return 429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}}, \
+                {'retry-after': f'{delay:.2f}'}
+        time.sleep(delay)
+        if error == 'server_error':
+            return 503, {'error': {'message': 'The server is overloaded', 'type': 'server_error'}}, {}
+
+        text = self.text_for(prompt)
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = min(max_tokens, len(text) // 4 + 1)
+        with self._lock:
+            self.total_tokens += prompt_tokens + completion_tokens
+        return 200, {
+            'object': 'text_completion',
+            'choices': [{'text': text, 'index': 0, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens,
+                      'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        }, {}
+
+    def __call__(self, prompt: str, max_tokens: int = 16, **params):
+        """Drop-in replacement for openai.Completion.create"""
+        status, body, headers = self.respond(prompt, max_tokens)
+        if status == 429:
+            raise openai.error.RateLimitError(body['error']['message'], http_status=status, headers=headers)
+        if status != 200:
+            raise openai.error.ServiceUnavailableError(body['error']['message'], http_status=status)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(**choice) for choice in body['choices']],
+            usage=SimpleNamespace(**body['usage'])
+        )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake: FakeCompletion = None
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/completions'):
+            self._send(404, {'error': {'message': f'Unknown path {self.path}'}}, {})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        prompt = payload.get('prompt') or ''
+        if isinstance(prompt, list):
+            prompt = prompt[0] if prompt else ''
+        self._send(*self.fake.respond(prompt, int(payload.get('max_tokens') or 16)))
+
+    def _send(self, status: int, body: Dict, headers: Dict) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(fake: FakeCompletion, host: str = '127.0.0.1', port: int = 8099) -> ThreadingHTTPServer:
+    """HTTP server exposing fake at http://host:port/v1/completions"""
+    handler = type('FakeCompletionHandler', (_Handler,), {'fake': fake})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a deterministic fake OpenAI completion API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.05, help='mean seconds per completion')
+    parser.add_argument('--jitter', type=float, default=0.5, help='latency varies by +/- this fraction')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of calls answered with 503')
+    parser.add_argument('--rpm', type=float, default=None, help='requests per minute before answering 429')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeCompletion(latency=args.latency, latency_jitter=args.jitter, error_rate=args.error_rate,
+                          requests_per_minute=args.rpm, seed=args.seed)
+    server = make_server(fake, args.host, args.port)
+    print(f"Fake completion API on http://{args.host}:{args.port}/v1 (set OPENAI_API_BASE to this)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {fake.counters()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""End-to-end benchmark of report generation against the fake completion API
+
+Run from backend/:
+
+    python -m benchmarks.run --claims 10,50 --products 3,10 --reports 20
+    python -m benchmarks.run --mode report ...   # generate_infringement_report, needs DATABASE_URL
+    python -m benchmarks.run --mode http ...     # POST /api/analyze, needs DATABASE_URL
+
+objects mode builds reports straight from synthetic snapshots and needs no
+database. The other modes insert BENCH-* patents and companies, one fresh
+pair per report so stored reports are never reused, and delete them after.
+"""
+from typing import Callable, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import gc
+import json
+import logging
+import math
+import resource
+import time
+import tracemalloc
+
+from analysis import LLMClient, PatentAnalyzer
+from llm_cache import CompletionCache
+from benchmarks.fake_llm import FakeCompletion
+from benchmarks.synthetic import BENCH_PREFIX, make_company, make_patent
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def build_analyzer(fake: FakeCompletion, args) -> PatentAnalyzer:
+    # Limits high enough that only the fake's own rate limit applies
+    client = LLMClient(api_key='benchmark',
+                       requests_per_minute=args.client_rpm,
+                       tokens_per_minute=args.client_tpm,
+                       backoff_base=0.05,
+                       backoff_max=1.0,
+                       completion_fn=fake)
+    return PatentAnalyzer(openai_api_key='benchmark',
+                          max_workers=args.workers,
+                          max_inflight_calls=args.inflight,
+                          claim_batch_size=args.batch_size,
+                          completion_cache=CompletionCache() if args.cache else None,
+                          llm_client=client,
+                          consolidated=args.consolidated)
+
+
+def measure(run_one: Callable[[int], None], reports: int, concurrency: int, trace_memory: bool) -> Dict:
+    """Run reports through run_one(index) and collect latency, throughput and memory"""
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    latencies = [0.0] * reports
+    failures = []
+
+    def timed(index):
+        started = time.perf_counter()
+        try:
+            run_one(index)
+        except Exception as e:
+            failures.append(str(e))
+        latencies[index] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bench') as executor:
+        list(executor.map(timed, range(reports)))
+    wall = time.perf_counter() - started
+
+    result = {
+        'reports': reports,
+        'failed': len(failures),
+        'wall_seconds': round(wall, 3),
+        'reports_per_second': round(reports / wall, 3) if wall else 0.0,
+        'p50_seconds': round(percentile(latencies, 50), 3),
+        'p95_seconds': round(percentile(latencies, 95), 3),
+        'p99_seconds': round(percentile(latencies, 99), 3),
+        # ru_maxrss is in KiB on Linux
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+    if trace_memory:
+        result['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        tracemalloc.stop()
+    if failures:
+        result['first_error'] = failures[0]
+    return result
+
+
+def objects_runner(analyzer: PatentAnalyzer, claims: int, products: int, seed: int):
+    def run_one(index):
+        patent = make_patent(index, claims, seed)
+        company = make_company(index, products, seed)
+        report = None
+        for event, data in analyzer.iter_report_for(patent, company):
+            if event == 'report':
+                report = data
+        if report is None:
+            raise RuntimeError('no report generated')
+    return run_one
+
+
+def seed_database(reports: int, claims: int, products: int, seed: int):
+    from models import db, Patent, Company
+    pairs = []
+    for index in range(reports):
+        patent = make_patent(index, claims, seed)
+        company = make_company(index, products, seed)
+        db.session.add(Patent(publication_number=patent.publication_number, title=patent.title,
+                              abstract=patent.abstract, claims=patent.claims))
+        db.session.add(Company(name=company.name, products=company.products))
+        pairs.append((patent.publication_number, company.name))
+    db.session.commit()
+    return pairs
+
+
+def clean_database():
+    from models import db, Patent, Company, Report
+    pattern = f'{BENCH_PREFIX}%'
+    Report.query.filter(Report.patent_publication_number.like(pattern)).delete(synchronize_session=False)
+    Patent.query.filter(Patent.publication_number.like(pattern)).delete(synchronize_session=False)
+    Company.query.filter(Company.name.like(pattern)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def report_runner(flask_app, analyzer: PatentAnalyzer, pairs):
+    def run_one(index):
+        patent_id, company_name = pairs[index]
+        with flask_app.app_context():
+            if analyzer.generate_infringement_report(patent_id, company_name) is None:
+                raise RuntimeError('no report generated')
+    return run_one
+
+
+def http_runner(flask_app, pairs):
+    client = flask_app.test_client()
+
+    def run_one(index):
+        patent_id, company_name = pairs[index]
+        response = client.post('/api/analyze', json={'patent_id': patent_id, 'company_name': company_name})
+        if response.status_code != 200:
+            raise RuntimeError(f'HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return run_one
+
+
+def parse_sizes(value: str) -> List[int]:
+    return [int(size) for size in value.split(',') if size.strip()]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark report generation against a fake LLM')
+    parser.add_argument('--mode', choices=('objects', 'report', 'http'), default='objects')
+    parser.add_argument('--claims', type=parse_sizes, default=[10, 50], help='claims per patent, comma separated')
+    parser.add_argument('--products', type=parse_sizes, default=[3, 10], help='products per company, comma separated')
+    parser.add_argument('--reports', type=int, default=20, help='reports per size combination')
+    parser.add_argument('--concurrency', type=int, default=4, help='reports generated at once')
+    parser.add_argument('--workers', type=int, default=4, help='analyzer product workers')
+    parser.add_argument('--inflight', type=int, default=8, help='analyzer concurrent completion calls')
+    parser.add_argument('--batch-size', type=int, default=5, help='claims screened per call')
+    parser.add_argument('--consolidated', action='store_true', help='one JSON request per product')
+    parser.add_argument('--cache', action='store_true', help='enable the in-process completion cache')
+    parser.add_argument('--latency', type=float, default=0.05, help='mean fake completion latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.5, help='latency varies by +/- this fraction')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of fake calls failing with 503')
+    parser.add_argument('--rpm', type=float, default=None, help='fake API requests per minute before 429')
+    parser.add_argument('--client-rpm', type=float, default=1e6, help='LLMClient limiter requests per minute')
+    parser.add_argument('--client-tpm', type=float, default=1e9, help='LLMClient limiter tokens per minute')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace-memory', action='store_true', help='report tracemalloc peak (slower)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON lines')
+    parser.add_argument('--verbose', action='store_true', help='keep retry warnings and request logs')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.verbose:
+        # Injected errors would otherwise log a retry warning each
+        logging.disable(logging.WARNING)
+    fake = FakeCompletion(latency=args.latency, latency_jitter=args.jitter, error_rate=args.error_rate,
+                          requests_per_minute=args.rpm, seed=args.seed)
+    analyzer = build_analyzer(fake, args)
+
+    flask_app = None
+    if args.mode != 'objects':
+        import app as app_module
+        flask_app = app_module.app
+        # Routes look the analyzer up at request time
+        app_module.analyzer = analyzer
+
+    if not args.json:
+        print(f"{'claims':>6} {'products':>8} {'calls/rpt':>9} {'tok/rpt':>8} {'rpt/s':>7} "
+              f"{'p50':>7} {'p95':>7} {'p99':>7} {'rss MB':>7} {'failed':>6}")
+
+    for claims in args.claims:
+        for products in args.products:
+            fake.reset_counters()
+            if args.mode == 'objects':
+                result = measure(objects_runner(analyzer, claims, products, args.seed),
+                                 args.reports, args.concurrency, args.trace_memory)
+            else:
+                with flask_app.app_context():
+                    clean_database()
+                    pairs = seed_database(args.reports, claims, products, args.seed)
+                try:
+                    run_one = (report_runner(flask_app, analyzer, pairs) if args.mode == 'report'
+                               else http_runner(flask_app, pairs))
+                    result = measure(run_one, args.reports, args.concurrency, args.trace_memory)
+                finally:
+                    with flask_app.app_context():
+                        clean_database()
+
+            counters = fake.counters()
+            result.update({
+                'mode': args.mode,
+                'claims': claims,
+                'products': products,
+                'calls_per_report': round(counters['calls'] / args.reports, 2),
+                'tokens_per_report': round(counters['total_tokens'] / args.reports),
+                'fake_errors': counters['errors'],
+                'fake_rate_limited': counters['rate_limited']
+            })
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(f"{claims:>6} {products:>8} {result['calls_per_report']:>9} {result['tokens_per_report']:>8} "
+                      f"{result['reports_per_second']:>7} {result['p50_seconds']:>7} {result['p95_seconds']:>7} "
+                      f"{result['p99_seconds']:>7} {result['max_rss_mb']:>7} {result['failed']:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Synthetic patents and companies of a chosen size, identical for a given seed"""
+from typing import Dict, List
+from datetime import datetime
+import random
+
+from catalog import CompanySnapshot, PatentSnapshot
+
+VOCABULARY = (
+    'sensor wireless module controller signal processor battery charging display housing '
+    'antenna memory network packet encryption camera image lens motor actuator feedback '
+    'temperature pressure valve circuit voltage current frequency interface protocol server '
+    'client storage database query index vehicle navigation location acoustic speaker '
+    'microphone filter amplifier optical fiber laser substrate layer coating polymer'
+).split()
+
+BENCH_PREFIX = 'BENCH'
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def make_claims(rng: random.Random, count: int) -> List[Dict]:
+    claims = []
+    for num in range(1, count + 1):
+        # Roughly one independent claim for every five
+        if num == 1 or rng.random() < 0.2:
+            text = f'A system comprising a {_text(rng, 30)}.'
+            independent = True
+        else:
+            text = f'The system of claim {rng.randint(1, num - 1)}, wherein {_text(rng, 20)}.'
+            independent = False
+        claims.append({'num': f'{num:05d}', 'text': text, 'independent': independent})
+    return claims
+
+
+def make_patent(index: int, claims: int, seed: int = 0) -> PatentSnapshot:
+    rng = random.Random(f'patent-{seed}-{index}-{claims}')
+    return PatentSnapshot(publication_number=f'{BENCH_PREFIX}-{claims}-{index:06d}',
+                          title=_text(rng, 8).title(),
+                          abstract=_text(rng, 120),
+                          claims=make_claims(rng, claims),
+                          content_hash=None,
+                          updated_at=datetime(2024, 1, 1))
+
+
+def make_company(index: int, products: int, seed: int = 0) -> CompanySnapshot:
+    rng = random.Random(f'company-{seed}-{index}-{products}')
+    return CompanySnapshot(id=index,
+                           name=f'{BENCH_PREFIX} Company {products}-{index:06d}',
+                           products=[{'name': f'{_text(rng, 2).title()} {number}',
+                                      'description': _text(rng, 60)}
+                                     for number in range(1, products + 1)],
+                           content_hash=None,
+                           updated_at=datetime(2024, 1, 1))
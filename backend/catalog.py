@@ -0,0 +1,228 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from dataclasses import asdict, dataclass, is_dataclass
+from datetime import datetime
+from collections import OrderedDict
+from models import db, Patent, Company, DataVersion
+import metrics
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PatentSnapshot:
+    """分析器需要的專利欄位，與 session 脫鉤的唯讀副本"""
+    publication_number: str
+    title: str
+    abstract: Optional[str]
+    claims: Optional[List[Dict]]
+    content_hash: Optional[str]
+    updated_at: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class CompanySnapshot:
+    """分析器需要的公司欄位，與 session 脫鉤的唯讀副本"""
+    id: int
+    name: str
+    products: Optional[List[Dict]]
+    content_hash: Optional[str]
+    updated_at: Optional[datetime]
+
+
+def _sizeof(value: Any) -> int:
+    """以 JSON 長度粗估快取值佔用的記憶體"""
+    if is_dataclass(value):
+        value = asdict(value)
+    return len(json.dumps(value, default=str))
+
+
+class CatalogCache:
+    """專利與公司資料的 LRU 快取，依總大小限制；各 worker 依 data_versions 的版本清除過期項目"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, check_interval: float = 5.0):
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._size = 0
+        self._versions: Dict[str, int] = {}
+        self._generation = 0
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._version_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> 'CatalogCache':
+        return cls(max_bytes=int(os.environ.get('CATALOG_CACHE_BYTES', 64 * 1024 * 1024)),
+                   check_interval=float(os.environ.get('CATALOG_CACHE_CHECK_INTERVAL', 5.0)))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _refresh_versions(self) -> None:
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        # 只讓一個執行緒查詢版本，其他執行緒照常使用快取
+        if not self._version_lock.acquire(blocking=False):
+            return
+        try:
+            try:
+                versions = dict(db.session.query(DataVersion.name, DataVersion.version).all())
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f'Error reading data versions: {str(e)}')
+                self.clear()
+                return
+            with self._lock:
+                stale = {name for name in set(versions) | set(self._versions)
+                         if versions.get(name) != self._versions.get(name)}
+                if stale and self._checked_at is not None:
+                    logger.info(f'Catalog cache invalidated for {", ".join(sorted(stale))}')
+                    for key in [key for key in self._entries if key[0] in stale]:
+                        self._drop(key)
+                    self._generation += 1
+                self._versions = versions
+                self._checked_at = now
+        finally:
+            self._version_lock.release()
+
+    def version(self, table: str) -> Optional[int]:
+        """此 worker 最近看到的資料表匯入版本"""
+        self._refresh_versions()
+        return self._versions.get(table)
+
+    def get(self, key: Tuple[Hashable, ...], loader: Callable[[], Any]) -> Any:
+        """取得快取值，未命中時呼叫 loader()；loader 須回傳不綁定 session 的資料，None 不快取"""
+        if not self.enabled:
+            return loader()
+        self._refresh_versions()
+        with self._lock:
+            entry = self._entries.get(key)
+            metrics.count_cache('catalog', entry is not None)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+        if value is None:
+            return value
+        size = _sizeof(value)
+        with self._lock:
+            # 清除之前讀到的舊值，以及大到會擠掉所有項目的值，都不放入快取
+            if generation != self._generation or size > self.max_bytes:
+                return value
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+        return value
+
+    def _drop(self, key) -> None:
+        _, size = self._entries.pop(key)
+        self._size -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._generation += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'versions': dict(self._versions)
+            }
+
+
+catalog_cache = CatalogCache.from_env()
+
+
+def get_patent(publication_number: str) -> Optional[PatentSnapshot]:
+    def load():
+        patent = Patent.for_analysis(publication_number)
+        if not patent:
+            return None
+        return PatentSnapshot(publication_number=patent.publication_number,
+                              title=patent.title,
+                              abstract=patent.abstract,
+                              claims=patent.claims,
+                              content_hash=patent.content_hash,
+                              updated_at=patent.updated_at)
+    return catalog_cache.get(('patents', 'analysis', publication_number), load)
+
+
+def get_company(name: str) -> Optional[CompanySnapshot]:
+    def load():
+        company = Company.query.filter_by(name=name).first()
+        if not company:
+            return None
+        return CompanySnapshot(id=company.id,
+                               name=company.name,
+                               products=company.products,
+                               content_hash=company.content_hash,
+                               updated_at=company.updated_at)
+    return catalog_cache.get(('companies', 'by_name', name), load)
+
+
+def list_companies() -> List[Dict]:
+    def load():
+        return [{
+            'id': company.id,
+            'name': company.name,
+            'products': company.products
+            } for company in Company.query.order_by(Company.id).all()
+        ]
+    return catalog_cache.get(('companies', 'list'), load)
+
+
+def list_patents(limit: int, cursor: Optional[str] = None, prefix: Optional[str] = None) -> List[Tuple[str, str]]:
+    """以 keyset 分頁取得 (publication_number, title)，多取一筆用來判斷是否有下一頁"""
+    def load():
+        query = Patent.listing_query()
+        if cursor:
+            query = query.filter(Patent.publication_number > cursor)
+        if prefix:
+            query = query.filter(db.func.lower(Patent.title).startswith(prefix.lower(), autoescape=True))
+        rows = query.order_by(Patent.publication_number).limit(limit + 1).all()
+        return [tuple(row) for row in rows]
+    return catalog_cache.get(('patents', 'list', limit, cursor, prefix), load)
+
+
+def get_patent_detail(publication_number: str) -> Optional[Dict]:
+    def load():
+        patent = Patent.for_detail(publication_number)
+        if not patent:
+            return None
+        return {
+            'publication_number': patent.publication_number,
+            'title': patent.title,
+            'abstract': patent.abstract,
+            'description': patent.description,
+            'assignee': patent.assignee,
+            'inventors': patent.inventors,
+            'priority_date': patent.priority_date,
+            'application_date': patent.application_date,
+            'grant_date': patent.grant_date,
+            'claims': patent.claims,
+            'jurisdictions': patent.jurisdictions,
+            'classifications': patent.classifications
+        }
+    return catalog_cache.get(('patents', 'detail', publication_number), load)
@@ -0,0 +1,179 @@
+from typing import Dict, List, Optional
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import re
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class HashingEmbedder:
+    """離線嵌入：將單字與雙字詞雜湊到固定維度，不需呼叫任何 API"""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.name = f'hashing-{dim}'
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r'[a-z0-9]+', text.lower())
+        return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.md5(feature.encode('utf-8')).digest()
+                index = int.from_bytes(digest[:4], 'little') % self.dim
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vectors[row, index] += sign
+        return _normalize_rows(vectors)
+
+
+class OpenAIEmbedder:
+    """使用 OpenAI embeddings API，經由 LLMClient 共用限流與重試"""
+
+    def __init__(self, llm_client, model: str = 'text-embedding-ada-002', batch_size: int = 100):
+        self.llm_client = llm_client
+        self.model = model
+        self.batch_size = batch_size
+        self.name = model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self.llm_client.embed(texts[i:i + self.batch_size], self.model))
+        return _normalize_rows(np.array(vectors, dtype=np.float32).reshape(len(texts), -1))
+
+
+class EmbeddingStore:
+    """權利要求與產品描述的向量快取：記憶體 LRU，並可選擇以 .npy 檔保存"""
+
+    def __init__(self, directory: Optional[str] = None, max_entries: int = 256):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.npy')
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vectors = self._entries.get(key)
+            if vectors is not None:
+                self._entries.move_to_end(key)
+                return vectors
+        if self.directory and os.path.exists(self._path(key)):
+            vectors = np.load(self._path(key))
+            self._remember(key, vectors)
+            return vectors
+        return None
+
+    def set(self, key: str, vectors: np.ndarray) -> None:
+        self._remember(key, vectors)
+        if self.directory:
+            # 先寫暫存檔再改名，避免其他 worker 讀到寫一半的檔案
+            tmp_path = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as file:
+                np.save(file, vectors)
+            os.replace(tmp_path, self._path(key))
+
+    def _remember(self, key: str, vectors: np.ndarray) -> None:
+        with self._lock:
+            self._entries[key] = vectors
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class ClaimPrefilter:
+    """以向量相似度預先篩選權利要求，只把最相關的送給 LLM"""
+
+    def __init__(self,
+                 embedder,
+                 store: Optional[EmbeddingStore] = None,
+                 top_k: Optional[int] = 10,
+                 threshold: Optional[float] = None,
+                 product_store: Optional[EmbeddingStore] = None):
+        self.embedder = embedder
+        self.store = store if store is not None else EmbeddingStore()
+        # 產品向量很小但數量多，另用一個 LRU，避免擠掉權利要求向量
+        self.product_store = product_store if product_store is not None \
+            else EmbeddingStore(self.store.directory, max_entries=4096)
+        self.top_k = top_k
+        self.threshold = threshold
+
+    @classmethod
+    def from_env(cls, llm_client) -> Optional['ClaimPrefilter']:
+        kind = os.environ.get('CLAIM_PREFILTER', '').lower()
+        if not kind or kind == 'off':
+            return None
+        if kind == 'openai':
+            embedder = OpenAIEmbedder(llm_client,
+                                      model=os.environ.get('CLAIM_EMBEDDING_MODEL', 'text-embedding-ada-002'))
+        elif kind == 'hashing':
+            embedder = HashingEmbedder()
+        else:
+            raise ValueError(f'Unknown CLAIM_PREFILTER: {kind}')
+        threshold = os.environ.get('CLAIM_PREFILTER_THRESHOLD')
+        return cls(embedder,
+                   store=EmbeddingStore(os.environ.get('CLAIM_EMBEDDING_DIR')),
+                   top_k=int(os.environ.get('CLAIM_PREFILTER_TOP_K', 10)) or None,
+                   threshold=float(threshold) if threshold else None)
+
+    def _key(self, texts: List[str]) -> str:
+        digest = hashlib.sha256()
+        digest.update(self.embedder.name.encode('utf-8'))
+        for text in texts:
+            digest.update(b'\0')
+            digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _claim_vectors(self, texts: List[str]) -> np.ndarray:
+        # 同一專利的權利要求只嵌入一次
+        key = self._key(texts)
+        vectors = self.store.get(key)
+        if vectors is None:
+            vectors = self.embedder.embed(texts)
+            self.store.set(key, vectors)
+        return vectors
+
+    def _product_vector(self, text: str) -> np.ndarray:
+        # 同一產品描述只嵌入一次，跨專利、跨報告重複使用
+        key = f'product-{self._key([text])}'
+        vectors = self.product_store.get(key)
+        if vectors is None:
+            vectors = self.embedder.embed([text])
+            self.product_store.set(key, vectors)
+        return vectors[0]
+
+    def select(self, claims: List[Dict], product_description: str) -> List[Dict]:
+        """回傳最相關的權利要求，維持原本順序"""
+        if not claims:
+            return claims
+
+        claim_vectors = self._claim_vectors([claim['text'] for claim in claims])
+        product_vector = self._product_vector(product_description)
+        # 向量皆已正規化，內積即為 cosine similarity
+        scores = claim_vectors @ product_vector
+
+        selected = np.arange(len(claims))
+        if self.threshold is not None:
+            selected = selected[scores[selected] >= self.threshold]
+        if self.top_k is not None and len(selected) > self.top_k:
+            best = np.argsort(-scores[selected], kind='stable')[:self.top_k]
+            selected = selected[best]
+
+        logger.debug(f'Claim prefilter kept {len(selected)} of {len(claims)} claims')
+        return [claims[i] for i in sorted(selected)]
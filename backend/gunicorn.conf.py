@@ -0,0 +1,52 @@
+# Production server settings: gunicorn -c gunicorn.conf.py app:app
+#
+# Requests spend most of their time waiting on OpenAI, so each worker process
+# runs several threads. Every worker builds its own PatentAnalyzer, thread
+# pools and rate limiter on first use (see get_analyzer in app.py).
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 4000)}")
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Synchronous /api/analyze calls and SSE streams can run for minutes
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 300))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 60))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then to bound memory growth of the in-process caches
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+# Not preloaded, so no DB connection or cache opened at import time is shared
+# across forked workers
+preload_app = False
+
+
+def on_starting(server):
+    # Every worker takes 1/OPENAI_PROCESS_COUNT of the OpenAI budget (see LLMClient.from_env)
+    processes = int(os.environ.get('OPENAI_PROCESS_COUNT', 1))
+    if processes < workers:
+        server.log.warning(f'OPENAI_PROCESS_COUNT={processes} is below the {workers} workers; '
+                           'together they may exceed OPENAI_RPM and OPENAI_TPM')
+
+    # Start each run with empty Prometheus multiprocess files
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.endswith('.db'):
+                os.remove(os.path.join(path, name))
+
+
+def child_exit(server, worker):
+    # Drop the metrics files of workers that exited (Prometheus multiprocess mode)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,48 @@
+from functools import wraps
+from flask import make_response, request
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _matches(etag: str) -> bool:
+    if request.if_none_match.star_tag:
+        return True
+    for tag in request.if_none_match.as_set():
+        # Flask-Compress 會在壓縮回應的 ETag 後加上 ":<encoding>"
+        if tag.split(':', 1)[0] == etag:
+            return True
+    return False
+
+
+def conditional(etag_basis, max_age: int = 60):
+    """用戶端 ETag 仍有效時直接回 304，不執行 view；etag_basis 回傳資料指紋，None 表示不快取"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                basis = etag_basis(*args, **kwargs)
+            except Exception as e:
+                # 交給 view 產生一般的錯誤回應
+                logger.error(f'Error computing ETag: {str(e)}')
+                basis = None
+            if basis is None:
+                return f(*args, **kwargs)
+
+            # 不同的 query string 代表不同的分頁或篩選條件
+            payload = f'{request.path}?{request.query_string.decode()}|{basis}'
+            etag = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+            cache_control = f'public, max-age={max_age}, must-revalidate'
+
+            if _matches(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return decorated_function
+    return decorator
@@ -1,7 +1,29 @@
+import argparse
+import hashlib
+import io
 import json
+import multiprocessing
+import os
+import threading
+import time
 import psycopg2
 from datetime import datetime
 from psycopg2.extras import Json
+from models import PATENT_SEARCH_VECTOR, normalize_claims
+
+PATENT_COLUMNS = (
+    'publication_number', 'title', 'abstract', 'description',
+    'assignee', 'inventors', 'priority_date', 'application_date',
+    'grant_date', 'claims', 'jurisdictions', 'classifications', 'content_hash'
+)
+
+COMPANY_COLUMNS = ('name', 'products', 'content_hash')
+
+# table -> (conflict key column, loaded columns, reports column to invalidate)
+IMPORT_SPECS = {
+    'patents': ('publication_number', PATENT_COLUMNS, 'patent_publication_number'),
+    'companies': ('name', COMPANY_COLUMNS, 'company_name')
+}
 
 def parse_date(date_str):
     """Parse date string to datetime object"""
@@ -38,7 +60,7 @@ def create_tables(conn):
                 priority_date DATE,
                 application_date DATE,
                 grant_date DATE,
-                claims TEXT,
+                claims JSONB,
                 jurisdictions VARCHAR(100),
                 classifications TEXT,
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
@@ -85,9 +107,173 @@ def create_tables(conn):
             CREATE UNIQUE INDEX IF NOT EXISTS idx_patent_company_unique 
             ON reports(patent_publication_number, company_name)
         """)
+
+        # Per-product index rows for /api/reports
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS report_products (
+                id SERIAL PRIMARY KEY,
+                report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+                patent_publication_number VARCHAR(50) NOT NULL,
+                company_name VARCHAR(200) NOT NULL,
+                product_name VARCHAR(500) NOT NULL,
+                infringement_likelihood VARCHAR(20) NOT NULL,
+                relevant_claim_count INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_report_products_report_id ON report_products(report_id)")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_report_products_company
+            ON report_products(company_name, infringement_likelihood, id)
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_report_products_patent
+            ON report_products(patent_publication_number, infringement_likelihood, id)
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_report_products_likelihood
+            ON report_products(infringement_likelihood, id)
+        """)
+
+        # Reports stored before report_products existed only keep their top products
+        cur.execute("""
+            INSERT INTO report_products (
+                report_id, patent_publication_number, company_name,
+                product_name, infringement_likelihood, relevant_claim_count
+            )
+            SELECT r.id, r.patent_publication_number, r.company_name,
+                   p->>'product_name', p->>'infringement_likelihood',
+                   coalesce(jsonb_array_length(p->'relevant_claims'), 0)
+            FROM reports r
+            CROSS JOIN LATERAL jsonb_array_elements(r.analysis_data->'top_infringing_products') AS p
+            WHERE NOT EXISTS (SELECT 1 FROM report_products rp WHERE rp.report_id = r.id)
+        """)
+
+        # Per-product results reused across reports; rows of changed patents are deleted on delta import
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS product_analyses (
+                id SERIAL PRIMARY KEY,
+                patent_publication_number VARCHAR(50) NOT NULL,
+                product_hash VARCHAR(64) NOT NULL,
+                product_name VARCHAR(500) NOT NULL,
+                result JSONB NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_product_analyses_patent_product
+            ON product_analyses(patent_publication_number, product_hash)
+        """)
+
+        # Track finished chunks of bulk imports so interrupted runs can resume
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS import_checkpoints (
+                source TEXT NOT NULL,
+                start_offset BIGINT NOT NULL,
+                end_offset BIGINT NOT NULL,
+                row_count INTEGER NOT NULL,
+                completed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (source, start_offset)
+            )
+        """)
+
+        # Bumped on every import that writes rows; app workers poll it to drop cached data
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS data_versions (
+                name VARCHAR(50) PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Background job status, shared by every app worker
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_jobs (
+                job_id VARCHAR(32) PRIMARY KEY,
+                job_type VARCHAR(20) NOT NULL,
+                patent_id VARCHAR(50),
+                company_name VARCHAR(200),
+                patent_ids JSONB,
+                company_names JSONB,
+                status VARCHAR(20) NOT NULL,
+                progress JSONB,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_analysis_jobs_created_at ON analysis_jobs(created_at)")
+        cur.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_analysis_jobs_unfinished_pair
+            ON analysis_jobs(patent_id, company_name)
+            WHERE job_type = 'analysis' AND status IN ('queued', 'running')
+        """)
+
+        # max(updated_at) fingerprints the table for HTTP ETags
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_patents_updated_at ON patents(updated_at)")
+
+        # Supports title prefix filtering on /api/patents
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_patent_title_lower_prefix
+            ON patents (lower(title) text_pattern_ops)
+        """)
+
+        # Content hashes let delta imports skip unchanged rows
+        cur.execute("ALTER TABLE patents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)")
+        cur.execute("ALTER TABLE companies ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)")
+
+        # Older databases store claims as a TEXT blob of JSON; convert them once to
+        # structured JSONB with an independent flag per claim
+        cur.execute("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'patents' AND column_name = 'claims'
+        """)
+        if cur.fetchone()[0] != 'jsonb':
+            print("Converting patents.claims to JSONB...")
+            # The generated search_vector depends on claims and is recreated below
+            cur.execute("ALTER TABLE patents DROP COLUMN IF EXISTS search_vector")
+            cur.execute("ALTER TABLE patents ALTER COLUMN claims TYPE JSONB USING NULLIF(claims, '')::jsonb")
+            cur.execute(r"""
+                UPDATE patents SET claims = (
+                    SELECT coalesce(jsonb_agg(
+                        claim || jsonb_build_object(
+                            'independent', coalesce(claim->>'text', '') !~* '\mclaims?\s+\d')
+                        ORDER BY position), '[]'::jsonb)
+                    FROM jsonb_array_elements(
+                        CASE WHEN jsonb_typeof(claims) = 'string'
+                             THEN (claims #>> '{}')::jsonb ELSE claims END
+                    ) WITH ORDINALITY AS t(claim, position)
+                )
+                WHERE jsonb_typeof(claims) IN ('string', 'array')
+            """)
+
+        # Full-text and trigram search over patents, maintained by Postgres on write
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cur.execute(f"""
+            ALTER TABLE patents ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS ({PATENT_SEARCH_VECTOR}) STORED
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_patent_search_vector
+            ON patents USING gin (search_vector)
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_patent_title_trgm
+            ON patents USING gin (title gin_trgm_ops)
+        """)
         
         conn.commit()
 
+def bump_data_version(cur, table):
+    """Tell running app workers that their cached copy of a table is stale"""
+    cur.execute("""
+        INSERT INTO data_versions (name, version, updated_at)
+        VALUES (%s, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (name) DO UPDATE
+        SET version = data_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+    """, (table,))
+
 def import_patents(conn, file_path):
     """Import patents from JSON file"""
     print("Importing patents...")
@@ -113,11 +299,12 @@ def import_patents(conn, file_path):
                 parse_date(patent['priority_date']),
                 parse_date(patent['application_date']),
                 parse_date(patent['grant_date']),
-                patent['claims'],
+                Json(normalize_claims(patent['claims'])),
                 patent['jurisdictions'],
                 patent['classifications']
             ))
-        
+
+        bump_data_version(cur, 'patents')
         conn.commit()
     print("Patents imported successfully")
 
@@ -137,12 +324,456 @@ def import_companies(conn, file_path):
                 company['name'],
                 Json(company['products'])
             ))
-        
+
+        bump_data_version(cur, 'companies')
         conn.commit()
     print("Companies imported successfully")
 
+def iter_json_records(file_path, key=None, start_offset=0, read_size=1 << 16):
+    """Stream (end_offset, record) pairs from a JSON array (optionally nested under key) or a JSON Lines file
+
+    end_offset is the byte offset right after the record, so a later run can
+    resume by passing it back as start_offset.
+    """
+    if file_path.endswith(('.jsonl', '.ndjson')):
+        with open(file_path, 'rb') as file:
+            file.seek(start_offset)
+            offset = start_offset
+            for line in file:
+                offset += len(line)
+                line = line.strip()
+                if line:
+                    yield offset, json.loads(line)
+        return
+
+    decoder = json.JSONDecoder()
+    with open(file_path, 'rb') as raw:
+        raw.seek(start_offset)
+        file = io.TextIOWrapper(raw, encoding='utf-8')
+        buffer = ''
+        eof = False
+        pos = 0
+        # Byte offset of buffer[pos] in the file
+        pos_offset = start_offset
+
+        def fill(size):
+            nonlocal buffer, eof, pos
+            data = file.read(size)
+            if not data:
+                eof = True
+            # Drop the consumed prefix before growing the buffer
+            buffer = buffer[pos:] + data
+            pos = 0
+
+        def advance(new_pos):
+            nonlocal pos, pos_offset
+            pos_offset += len(buffer[pos:new_pos].encode('utf-8'))
+            pos = new_pos
+
+        def find_array_start():
+            """Index in buffer right after the '[' that opens the record array
+
+            With a key, the top-level object is walked token by token, so the
+            key's name inside a string value or a nested object is not mistaken
+            for the key itself.
+            """
+            depth = 0
+            in_string = escaped = False
+            expect_key = matched = False
+            key_chars = None
+            last_key = None
+            while True:
+                for i in range(pos, len(buffer)):
+                    c = buffer[i]
+                    if in_string:
+                        if escaped:
+                            escaped = False
+                        elif c == '\\':
+                            escaped = True
+                        elif c == '"':
+                            in_string = False
+                            if key_chars is not None:
+                                last_key = json.loads('"%s"' % ''.join(key_chars))
+                                key_chars = None
+                            continue
+                        if key_chars is not None:
+                            key_chars.append(c)
+                    elif c in ' \t\r\n':
+                        continue
+                    elif matched:
+                        if c == '[':
+                            return i + 1
+                        raise ValueError(f'"{key}" in {file_path} is not a JSON array')
+                    elif depth == 0:
+                        if key is None and c == '[':
+                            return i + 1
+                        if key is None or c != '{':
+                            raise ValueError(f"No JSON array found in {file_path}")
+                        depth = 1
+                        expect_key = True
+                    elif c == '"':
+                        in_string = True
+                        if depth == 1 and expect_key:
+                            key_chars = []
+                            expect_key = False
+                    elif c in '{[':
+                        depth += 1
+                    elif c in '}]':
+                        depth -= 1
+                        if depth == 0:
+                            raise ValueError(f'No "{key}" array found in {file_path}')
+                    elif depth == 1 and c == ',':
+                        expect_key = True
+                    elif depth == 1 and c == ':':
+                        matched = last_key == key
+                advance(len(buffer))
+                if eof:
+                    raise ValueError(f"No JSON array found in {file_path}")
+                fill(read_size)
+
+        if not start_offset:
+            advance(find_array_start())
+
+        size = read_size
+        while True:
+            # Skip separators between records
+            end = pos
+            while end < len(buffer) and buffer[end] in ' \t\r\n,':
+                end += 1
+            advance(end)
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError(f"Unexpected end of file in {file_path}")
+                fill(read_size)
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Record spans past the buffer, read more and retry
+                fill(size)
+                size *= 2
+                continue
+            size = read_size
+            advance(end)
+            yield pos_offset, record
+
+
+def to_copy_text(value):
+    """Format a value as a field of COPY ... FROM STDIN (text format)"""
+    if value is None:
+        return '\\N'
+    if not isinstance(value, str):
+        value = json.dumps(value) if isinstance(value, (list, dict)) else str(value)
+    return (value.replace('\\', '\\\\')
+                 .replace('\n', '\\n')
+                 .replace('\r', '\\r')
+                 .replace('\t', '\\t'))
+
+
+def content_hash(record):
+    """Stable hash of a source record, used to detect changed rows"""
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def patent_row(patent):
+    """Map a patent record to PATENT_COLUMNS order"""
+    return (
+        patent['publication_number'],
+        patent['title'],
+        patent.get('abstract'),
+        patent.get('description'),
+        patent.get('assignee'),
+        patent.get('inventors'),
+        parse_date(patent.get('priority_date')),
+        parse_date(patent.get('application_date')),
+        parse_date(patent.get('grant_date')),
+        normalize_claims(patent.get('claims')),
+        patent.get('jurisdictions'),
+        patent.get('classifications'),
+        content_hash(patent)
+    )
+
+
+def company_row(company):
+    """Map a company record to COMPANY_COLUMNS order"""
+    return (company['name'], company.get('products'), content_hash(company))
+
+
+def copy_rows(cur, table, columns, rows):
+    """Load rows into table through COPY"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(to_copy_text(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def load_chunk(conn, task):
+    """Merge one chunk through a staging table and record its checkpoint in the same transaction
+
+    In delta mode rows whose content hash changed are rewritten and the
+    cached reports and product analyses that depend on them are deleted. A chunk that writes any
+    row bumps the table's data version.
+    """
+    table, source, start_offset, end_offset, rows, delta = task
+    key_column, columns, report_column = IMPORT_SPECS[table]
+    staging = f'{table}_staging'
+    column_list = ', '.join(columns)
+
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {staging} AS
+            SELECT {column_list} FROM {table} WITH NO DATA
+        """)
+        copy_rows(cur, staging, columns, rows)
+        if delta:
+            update_list = ', '.join(f'{column} = EXCLUDED.{column}'
+                                    for column in columns if column != key_column)
+            # DISTINCT ON keeps the last copy of a key repeated within the chunk
+            cur.execute(f"""
+                INSERT INTO {table} ({column_list})
+                SELECT DISTINCT ON ({key_column}) {column_list} FROM {staging}
+                ORDER BY {key_column}, ctid DESC
+                ON CONFLICT ({key_column}) DO UPDATE
+                SET {update_list}, updated_at = CURRENT_TIMESTAMP
+                WHERE {table}.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                RETURNING {key_column}
+            """)
+            changed = [row[0] for row in cur.fetchall()]
+            if changed:
+                cur.execute(f"DELETE FROM reports WHERE {report_column} = ANY(%s)", (changed,))
+                if table == 'patents':
+                    cur.execute("DELETE FROM product_analyses WHERE patent_publication_number = ANY(%s)",
+                                (changed,))
+            written = len(changed)
+        else:
+            cur.execute(f"""
+                INSERT INTO {table} ({column_list})
+                SELECT {column_list} FROM {staging}
+                ON CONFLICT ({key_column}) DO NOTHING
+            """)
+            written = cur.rowcount
+        cur.execute(f"TRUNCATE {staging}")
+        cur.execute("""
+            INSERT INTO import_checkpoints (source, start_offset, end_offset, row_count)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (source, start_offset) DO NOTHING
+        """, (source, start_offset, end_offset, len(rows)))
+        if written:
+            # Last statement before commit so parallel loaders hold the row lock briefly
+            bump_data_version(cur, table)
+    conn.commit()
+    return len(rows)
+
+
+_worker_conn = None
+
+
+def _init_worker():
+    global _worker_conn
+    _worker_conn = connect_db()
+
+
+def read_chunk_rows(file_path, key, start_offset, end_offset, to_row):
+    """Parse the records between two byte offsets of the input and map them to rows"""
+    rows = []
+    for offset, record in iter_json_records(file_path, key=key, start_offset=start_offset):
+        rows.append(to_row(record))
+        if offset >= end_offset:
+            break
+    return rows
+
+
+def _load_range_in_worker(task):
+    # Parsing, claim normalization and hashing happen here, not in the parent
+    table, source, file_path, key, start_offset, end_offset, delta, to_row = task
+    rows = read_chunk_rows(file_path, key, start_offset, end_offset, to_row)
+    return load_chunk(_worker_conn, (table, source, start_offset, end_offset, rows, delta))
+
+
+def checkpoint_source(table, file_path, delta=False):
+    """Identify an input file and import mode so checkpoints from a different version or mode are ignored"""
+    stat = os.stat(file_path)
+    # A file already loaded in plain bulk mode must still be diffed by a later --delta run
+    mode = 'delta' if delta else 'bulk'
+    return f"{table}:{mode}:{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_checkpoints(conn, source, restart=False):
+    """Return (resume_offset, completed chunk spans) for an input file"""
+    with conn.cursor() as cur:
+        if restart:
+            cur.execute("DELETE FROM import_checkpoints WHERE source = %s", (source,))
+            conn.commit()
+            return 0, set()
+        cur.execute("""
+            SELECT start_offset, end_offset FROM import_checkpoints
+            WHERE source = %s ORDER BY start_offset
+        """, (source,))
+        spans = cur.fetchall()
+
+    # Resume from the end of the contiguous run of finished chunks
+    resume_offset = 0
+    for start_offset, end_offset in spans:
+        if start_offset != resume_offset:
+            break
+        resume_offset = end_offset
+    return resume_offset, set(spans)
+
+
+def iter_record_offsets(file_path, key=None, start_offset=0):
+    """Yield the end offset of each record, without parsing JSON Lines records"""
+    if file_path.endswith(('.jsonl', '.ndjson')):
+        with open(file_path, 'rb') as file:
+            file.seek(start_offset)
+            offset = start_offset
+            for line in file:
+                offset += len(line)
+                if line.strip():
+                    yield offset
+        return
+    # Array files need a parse to find record boundaries; json's C decoder keeps it cheap
+    for offset, _ in iter_json_records(file_path, key=key, start_offset=start_offset):
+        yield offset
+
+
+def iter_chunk_ranges(offsets, chunk_size, start_offset):
+    """Group record end offsets into (start_offset, end_offset, record count) chunks"""
+    count = 0
+    chunk_start = end_offset = start_offset
+    for end_offset in offsets:
+        count += 1
+        if count >= chunk_size:
+            yield chunk_start, end_offset, count
+            count = 0
+            chunk_start = end_offset
+    if count:
+        yield chunk_start, end_offset, count
+
+
+def iter_chunks(records, chunk_size, start_offset, to_row):
+    """Group (end_offset, record) pairs into (start_offset, end_offset, rows) chunks"""
+    rows = []
+    chunk_start = start_offset
+    end_offset = start_offset
+    for end_offset, record in records:
+        rows.append(to_row(record))
+        if len(rows) >= chunk_size:
+            yield chunk_start, end_offset, rows
+            rows = []
+            chunk_start = end_offset
+    if rows:
+        yield chunk_start, end_offset, rows
+
+
+def bulk_import(conn, file_path, table, to_row, key=None, batch_size=10000, workers=1, restart=False,
+                delta=False):
+    """Stream records in chunks through COPY; each chunk commits on its own and is checkpointed
+
+    With several workers the parent only finds chunk boundaries; each worker
+    re-reads its byte range and builds the rows itself.
+    """
+    source = checkpoint_source(table, file_path, delta)
+    resume_offset, completed = load_checkpoints(conn, source, restart)
+    # Don't leave the connection idle in a transaction while the chunks load
+    conn.commit()
+    if resume_offset:
+        print(f"  Resuming {table} import at byte offset {resume_offset}")
+
+    start = time.time()
+    stats = {'rows': 0, 'chunks': 0, 'skipped': 0}
+    errors = []
+
+    def report(rows):
+        stats['rows'] += rows
+        stats['chunks'] += 1
+        elapsed = time.time() - start
+        print(f"  {stats['rows']} {table} loaded in {stats['chunks']} chunks "
+              f"({stats['rows'] / max(elapsed, 1e-6):.0f} rows/s)")
+
+    if workers <= 1:
+        for chunk_start, chunk_end, rows in iter_chunks(
+                iter_json_records(file_path, key=key, start_offset=resume_offset),
+                batch_size, resume_offset, to_row):
+            if (chunk_start, chunk_end) in completed:
+                stats['skipped'] += 1
+                continue
+            report(load_chunk(conn, (table, source, chunk_start, chunk_end, rows, delta)))
+    else:
+        def tasks():
+            for chunk_start, chunk_end, _ in iter_chunk_ranges(
+                    iter_record_offsets(file_path, key=key, start_offset=resume_offset),
+                    batch_size, resume_offset):
+                if (chunk_start, chunk_end) in completed:
+                    stats['skipped'] += 1
+                    continue
+                yield (table, source, file_path, key, chunk_start, chunk_end, delta, to_row)
+
+        # Bound the chunks in flight so memory stays flat regardless of file size
+        slots = threading.BoundedSemaphore(workers * 2)
+
+        def done(rows):
+            report(rows)
+            slots.release()
+
+        def failed(error):
+            errors.append(error)
+            slots.release()
+
+        with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+            for task in tasks():
+                slots.acquire()
+                if errors:
+                    break
+                pool.apply_async(_load_range_in_worker, (task,), callback=done, error_callback=failed)
+            pool.close()
+            pool.join()
+
+    if errors:
+        raise errors[0]
+
+    elapsed = time.time() - start
+    print(f"{stats['rows']} {table} loaded in {elapsed:.1f}s "
+          f"({stats['rows'] / max(elapsed, 1e-6):.0f} rows/s, {stats['skipped']} chunks already done)")
+    return stats['rows']
+
+
+def bulk_import_patents(conn, file_path, batch_size=10000, workers=1, restart=False, delta=False):
+    """Bulk import patents from a JSON array or JSON Lines file"""
+    print("Bulk importing patents...")
+    return bulk_import(conn, file_path, 'patents', patent_row,
+                       batch_size=batch_size, workers=workers, restart=restart, delta=delta)
+
+
+def bulk_import_companies(conn, file_path, batch_size=10000, workers=1, restart=False, delta=False):
+    """Bulk import companies from {"companies": [...]} or a JSON Lines file"""
+    print("Bulk importing companies...")
+    return bulk_import(conn, file_path, 'companies', company_row, key='companies',
+                       batch_size=batch_size, workers=workers, restart=restart, delta=delta)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Import patents and companies into the database')
+    parser.add_argument('--patents', default='patents.json', help='patents JSON or JSON Lines file')
+    parser.add_argument('--companies', default='company_products.json', help='companies JSON or JSON Lines file')
+    parser.add_argument('--bulk', action='store_true', help='stream the input and load it through COPY')
+    parser.add_argument('--batch-size', type=int, default=10000, help='rows per COPY chunk in bulk mode')
+    parser.add_argument('--workers', type=int, default=1, help='parallel loader processes in bulk mode')
+    parser.add_argument('--restart', action='store_true', help='ignore checkpoints from an earlier bulk run')
+    parser.add_argument('--delta', action='store_true',
+                        help='bulk mode that rewrites changed rows and drops their cached reports')
+    return parser.parse_args()
+
 
 def main():
+    args = parse_args()
+    conn = None
     try:
         # Connect to database
         conn = connect_db()
@@ -152,8 +783,12 @@ def main():
         print("Tables created successfully!")
 
         # Import data
-        import_patents(conn, 'patents.json')
-        import_companies(conn, 'company_products.json')
+        if args.bulk or args.delta:
+            bulk_import_patents(conn, args.patents, args.batch_size, args.workers, args.restart, args.delta)
+            bulk_import_companies(conn, args.companies, args.batch_size, args.workers, args.restart, args.delta)
+        else:
+            import_patents(conn, args.patents)
+            import_companies(conn, args.companies)
         print("All data imported successfully!")
         
     except Exception as e:
@@ -164,4 +799,4 @@ def main():
             conn.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,273 @@
+from typing import Dict, List, Optional
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from flask import has_app_context
+from sqlalchemy.dialects.postgresql import insert
+from models import db, Job
+from reports import get_or_create_report
+from batch import BatchRunner, BatchStats
+import logging
+import traceback
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+UNFINISHED = (JOB_QUEUED, JOB_RUNNING)
+FINISHED = (JOB_COMPLETED, JOB_FAILED)
+
+
+@dataclass
+class AnalysisJob:
+    job_id: str
+    patent_id: str
+    company_name: str
+    status: str = JOB_QUEUED
+    completed_products: int = 0
+    total_products: int = 0
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+
+    @classmethod
+    def from_record(cls, record: Job) -> 'AnalysisJob':
+        progress = record.progress or {}
+        return cls(job_id=record.job_id,
+                   patent_id=record.patent_id,
+                   company_name=record.company_name,
+                   status=record.status,
+                   completed_products=progress.get('completed_products', 0),
+                   total_products=progress.get('total_products', 0),
+                   error=record.error,
+                   created_at=record.created_at,
+                   finished_at=record.finished_at)
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'patent_id': self.patent_id,
+            'company_name': self.company_name,
+            'status': self.status,
+            'progress': {
+                'completed_products': self.completed_products,
+                'total_products': self.total_products
+            },
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+@dataclass
+class BatchJob:
+    job_id: str
+    patent_ids: List[str]
+    company_names: List[str]
+    status: str = JOB_QUEUED
+    stats: BatchStats = field(default_factory=BatchStats)
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+
+    @classmethod
+    def from_record(cls, record: Job) -> 'BatchJob':
+        return cls(job_id=record.job_id,
+                   patent_ids=record.patent_ids or [],
+                   company_names=record.company_names or [],
+                   status=record.status,
+                   stats=BatchStats(**record.progress) if record.progress else BatchStats(),
+                   error=record.error,
+                   created_at=record.created_at,
+                   finished_at=record.finished_at)
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'type': 'batch',
+            'patent_ids': self.patent_ids,
+            'company_names': self.company_names,
+            'status': self.status,
+            'progress': self.stats.to_dict(),
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class JobManager:
+    """Runs analysis jobs on a local thread pool and keeps their state in analysis_jobs
+
+    Any worker process can report on a job, whichever one accepted it. A job
+    left queued or running by a worker that died stops blocking new jobs for
+    the same pair once it has not been updated for stale_after seconds.
+    """
+
+    def __init__(self, app, analyzer, max_workers: int = 2, max_retained_jobs: int = 1000,
+                 batch_workers: int = 4, batch_job_workers: int = 1, stale_after: float = 3600):
+        self.app = app
+        self.analyzer = analyzer
+        self.batch_workers = batch_workers
+        self.max_retained_jobs = max_retained_jobs
+        self.stale_after = stale_after
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                            thread_name_prefix='analysis-job')
+        # Batch jobs run for a long time, so they get their own pool and never
+        # hold up single analyses queued behind them
+        self._batch_executor = ThreadPoolExecutor(max_workers=max(1, batch_job_workers),
+                                                  thread_name_prefix='batch-job')
+
+    @contextmanager
+    def _app_context(self):
+        # Reuse the caller's context (and session) inside a request, push one on worker threads
+        if has_app_context():
+            yield
+        else:
+            with self.app.app_context():
+                yield
+
+    def submit(self, patent_id: str, company_name: str) -> AnalysisJob:
+        """Queue an analysis and return its job immediately"""
+        with self._app_context():
+            self._expire_stale(patent_id, company_name)
+            job_id = uuid.uuid4().hex
+            # The partial unique index keeps one unfinished job per pair across workers
+            statement = insert(Job.__table__).values(
+                job_id=job_id,
+                job_type='analysis',
+                patent_id=patent_id,
+                company_name=company_name,
+                status=JOB_QUEUED,
+                progress={'completed_products': 0, 'total_products': 0},
+                created_at=datetime.now(),
+                updated_at=datetime.now()
+            ).on_conflict_do_nothing(
+                index_elements=['patent_id', 'company_name'],
+                index_where=db.text("job_type = 'analysis' AND status IN ('queued', 'running')")
+            ).returning(Job.__table__.c.job_id)
+            created = db.session.execute(statement).scalar() is not None
+            if created:
+                self._prune()
+            db.session.commit()
+
+            if not created:
+                # Reuse the unfinished job for the same pair instead of queueing a duplicate
+                record = Job.query.filter(Job.job_type == 'analysis',
+                                          Job.patent_id == patent_id,
+                                          Job.company_name == company_name,
+                                          Job.status.in_(UNFINISHED)).first()
+                if record:
+                    return AnalysisJob.from_record(record)
+                # It finished in the meantime; queue a new one
+                return self.submit(patent_id, company_name)
+
+            job = AnalysisJob.from_record(db.session.get(Job, job_id))
+        self._executor.submit(self._run, job)
+        return job
+
+    def submit_batch(self, patent_ids: List[str], company_names: List[str]) -> BatchJob:
+        """Queue a portfolio analysis of every patent against every company"""
+        job = BatchJob(job_id=uuid.uuid4().hex, patent_ids=patent_ids, company_names=company_names)
+        with self._app_context():
+            db.session.add(Job(job_id=job.job_id,
+                               job_type='batch',
+                               patent_ids=patent_ids,
+                               company_names=company_names,
+                               status=job.status,
+                               progress=asdict(job.stats),
+                               created_at=job.created_at))
+            self._prune()
+            db.session.commit()
+        self._batch_executor.submit(self._run_batch, job)
+        return job
+
+    def get(self, job_id: str):
+        with self._app_context():
+            record = db.session.get(Job, job_id)
+            if record is None:
+                return None
+            if record.job_type == 'batch':
+                return BatchJob.from_record(record)
+            return AnalysisJob.from_record(record)
+
+    def _expire_stale(self, patent_id: str, company_name: str) -> None:
+        # Jobs of a worker that died never finish; fail them so the pair can be queued again
+        cutoff = datetime.now() - timedelta(seconds=self.stale_after)
+        Job.query.filter(Job.job_type == 'analysis',
+                         Job.patent_id == patent_id,
+                         Job.company_name == company_name,
+                         Job.status.in_(UNFINISHED),
+                         Job.updated_at < cutoff) \
+            .update({'status': JOB_FAILED,
+                     'error': 'Job abandoned by its worker',
+                     'finished_at': datetime.now()},
+                    synchronize_session=False)
+
+    def _prune(self) -> None:
+        # Drop the oldest finished jobs once we keep too many
+        retained = db.session.query(Job.job_id).order_by(Job.created_at.desc()).limit(self.max_retained_jobs)
+        Job.query.filter(Job.status.in_(FINISHED), Job.job_id.notin_(retained.scalar_subquery())) \
+            .delete(synchronize_session=False)
+
+    def _save(self, job_id: str, **values) -> None:
+        """Write job fields from a worker thread; a failure is logged and does not fail the job"""
+        with self._app_context():
+            try:
+                Job.query.filter_by(job_id=job_id) \
+                    .update(dict(values, updated_at=datetime.now()), synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f'Error saving job {job_id}: {str(e)}')
+
+    def _run(self, job: AnalysisJob) -> None:
+        job.status = JOB_RUNNING
+        self._save(job.job_id, status=job.status)
+
+        def on_progress(completed: int, total: int) -> None:
+            job.completed_products = completed
+            job.total_products = total
+            self._save(job.job_id, progress={'completed_products': completed, 'total_products': total})
+
+        with self._app_context():
+            try:
+                report = get_or_create_report(self.analyzer,
+                                              job.patent_id,
+                                              job.company_name,
+                                              progress_callback=on_progress)
+                if report:
+                    job.status = JOB_COMPLETED
+                else:
+                    job.status = JOB_FAILED
+                    job.error = 'No report generated'
+            except Exception as e:
+                logger.error(f'Analysis job {job.job_id} failed: {str(e)}')
+                logger.error(traceback.format_exc())
+                db.session.rollback()
+                job.status = JOB_FAILED
+                job.error = str(e)
+            finally:
+                job.finished_at = datetime.now()
+                self._save(job.job_id, status=job.status, error=job.error, finished_at=job.finished_at)
+
+    def _run_batch(self, job: BatchJob) -> None:
+        job.status = JOB_RUNNING
+        self._save(job.job_id, status=job.status)
+        try:
+            BatchRunner(self.app, self.analyzer, max_workers=self.batch_workers).run(
+                job.patent_ids, job.company_names, stats=job.stats,
+                on_progress=lambda stats: self._save(job.job_id, progress=asdict(stats)))
+            job.status = JOB_COMPLETED
+        except Exception as e:
+            logger.error(f'Batch job {job.job_id} failed: {str(e)}')
+            logger.error(traceback.format_exc())
+            job.status = JOB_FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now()
+            self._save(job.job_id, status=job.status, error=job.error,
+                       progress=asdict(job.stats), finished_at=job.finished_at)
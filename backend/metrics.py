@@ -0,0 +1,154 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import wraps
+from flask import g, request
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess, REGISTRY)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import os
+import threading
+import time
+
+# Analysis stages take seconds; DB queries and cache lookups take milliseconds
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+STAGE_SECONDS = Histogram('patent_analysis_stage_seconds', 'Time spent in each analysis stage',
+                          ['stage'], buckets=STAGE_BUCKETS)
+LLM_CALL_SECONDS = Histogram('patent_llm_call_seconds', 'OpenAI completion call latency, per attempt',
+                             ['model', 'outcome'], buckets=STAGE_BUCKETS)
+LLM_TOKENS = Counter('patent_llm_tokens_total', 'Tokens reported by OpenAI usage', ['model', 'kind'])
+CACHE_LOOKUPS = Counter('patent_cache_lookups_total', 'Cache lookups by cache and result', ['cache', 'result'])
+DB_QUERY_SECONDS = Histogram('patent_db_query_seconds', 'Database statement latency',
+                             ['statement'], buckets=QUERY_BUCKETS)
+HTTP_REQUEST_SECONDS = Histogram('patent_http_request_seconds', 'HTTP request latency by endpoint',
+                                 ['endpoint', 'method', 'status'], buckets=STAGE_BUCKETS)
+
+
+class RequestTimings:
+    """Seconds spent per stage during one request, summed across worker threads"""
+
+    def __init__(self):
+        self._totals: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            total, count = self._totals.get(stage, (0.0, 0))
+            self._totals[stage] = (total + seconds, count + 1)
+
+    def server_timing(self, total: float) -> str:
+        with self._lock:
+            items = sorted(self._totals.items())
+        parts = [f'{stage};dur={seconds * 1000:.1f};desc="{count}x"' for stage, (seconds, count) in items]
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar('request_timings', default=None)
+
+
+def _record(stage: str, seconds: float) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as an analysis stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        _record(stage, elapsed)
+
+
+def timed(stage: str):
+    """Decorator form of span"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            with span(stage):
+                return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def observe_llm_call(model: str, outcome: str, seconds: float, usage: Any = None) -> None:
+    LLM_CALL_SECONDS.labels(model, outcome).observe(seconds)
+    _record('openai', seconds)
+    if usage is not None:
+        for kind in ('prompt_tokens', 'completion_tokens'):
+            tokens = getattr(usage, kind, None)
+            if tokens:
+                LLM_TOKENS.labels(model, kind.split('_')[0]).inc(tokens)
+
+
+def count_cache(cache: str, hit: bool, count: int = 1) -> None:
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc(count)
+
+
+def submit(executor, fn: Callable, *args, **kwargs):
+    """executor.submit that carries the caller's request timings into the worker thread"""
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started_at'].pop()
+    # Label by verb only so the series count stays bounded
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+    DB_QUERY_SECONDS.labels(verb).observe(elapsed)
+    _record('db', elapsed)
+
+
+def init_app(app) -> None:
+    """Time every request, and add a Server-Timing header when SERVER_TIMING is enabled"""
+    server_timing = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true')
+
+    @app.before_request
+    def start_timing():
+        g.request_started_at = time.perf_counter()
+        g.request_timings_token = _timings.set(RequestTimings())
+
+    @app.after_request
+    def finish_timing(response):
+        started = g.get('request_started_at')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_SECONDS.labels(endpoint, request.method, str(response.status_code)).observe(elapsed)
+        timings = _timings.get()
+        if server_timing and timings is not None:
+            response.headers['Server-Timing'] = timings.server_timing(elapsed)
+        return response
+
+    @app.teardown_request
+    def reset_timing(error=None):
+        token = g.pop('request_timings_token', None)
+        if token is not None:
+            try:
+                _timings.reset(token)
+            except ValueError:
+                # Streamed responses may finish in another context
+                _timings.set(None)
+
+
+def render() -> Tuple[bytes, str]:
+    """Metrics in Prometheus text format, merged across workers in multiprocess mode"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,9 +1,35 @@
 from datetime import datetime
+import json
+import re
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred, load_only, undefer_group
 
 db = SQLAlchemy()
 
+# 全文檢索向量：標題權重最高，其次為摘要與權利要求
+PATENT_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(abstract, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(claims, '[]'::jsonb)), 'C')"
+)
+
+# 附屬項會引用其他權利要求，例如 "The method of claim 1, wherein ..."
+DEPENDENT_CLAIM_PATTERN = re.compile(r'\bclaims?\s+\d', re.IGNORECASE)
+
+def normalize_claims(claims):
+    """將權利要求整理為 [{"num", "text", "independent"}]，接受 JSON 字串或已解析的 list"""
+    if claims is None:
+        return []
+    if isinstance(claims, str):
+        claims = json.loads(claims) if claims.strip() else []
+    normalized = []
+    for claim in claims:
+        if 'independent' not in claim:
+            claim = dict(claim, independent=not DEPENDENT_CLAIM_PATTERN.search(claim.get('text') or ''))
+        normalized.append(claim)
+    return normalized
+
 class Patent(db.Model):
     __tablename__ = 'patents'
 
@@ -11,7 +37,8 @@ class Patent(db.Model):
     publication_number = db.Column(db.String(50), unique=True, nullable=False)
     title = db.Column(db.String(500), nullable=False)
     abstract = db.Column(db.Text)
-    description = db.Column(db.Text)
+    # 大欄位延遲載入，只有詳細頁需要
+    description = deferred(db.Column(db.Text), group='detail')
     assignee = db.Column(db.String(200))
     inventors = db.Column(JSONB)
     priority_date = db.Column(db.Date)
@@ -19,25 +46,121 @@ class Patent(db.Model):
     grant_date = db.Column(db.Date)
     claims = db.Column(JSONB)
     jurisdictions = db.Column(db.String(50))
-    classifications = db.Column(JSONB)
+    classifications = deferred(db.Column(JSONB), group='detail')
+    content_hash = db.Column(db.String(64))
+    search_vector = deferred(db.Column(TSVECTOR, db.Computed(PATENT_SEARCH_VECTOR, persisted=True)),
+                             group='search')
     created_at = db.Column(db.DateTime, default=datetime.now)
-    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    # 建立索引讓 max(updated_at) 可作為 ETag 依據
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
+
+    # 支援 /api/patents 的標題前綴查詢與 /api/patents/search 的全文、模糊檢索
+    # gin_trgm_ops 需要 pg_trgm 擴充套件
+    __table_args__ = (
+        db.Index('idx_patent_title_lower_prefix', db.text('lower(title) text_pattern_ops')),
+        db.Index('idx_patent_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('idx_patent_title_trgm', 'title',
+                 postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+    )
 
     def __repr__(self):
         return f'<Patent {self.publication_number}>'
 
+    @classmethod
+    def listing_query(cls):
+        """列表用：只取編號與標題，不建立 ORM 物件"""
+        return db.session.query(cls.publication_number, cls.title)
+
+    @classmethod
+    def for_analysis(cls, publication_number):
+        """分析用：只載入 analyzer 會讀取的欄位"""
+        return cls.query.options(load_only(
+            cls.publication_number, cls.title, cls.abstract, cls.claims,
+            cls.content_hash, cls.updated_at
+        )).filter_by(publication_number=publication_number).first()
+
+    @classmethod
+    def for_detail(cls, publication_number):
+        """詳細頁用：一次載入所有延遲欄位，避免逐欄再查詢"""
+        return cls.query.options(undefer_group('detail')) \
+            .filter_by(publication_number=publication_number).first()
+
 class Company(db.Model):
     __tablename__ = 'companies'
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), unique=True, nullable=False) # also indexed
     products = db.Column(JSONB)
+    content_hash = db.Column(db.String(64))
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
     def __repr__(self):
         return f'<Company {self.name}>'
 
+class ProductAnalysis(db.Model):
+    """單一產品對單一專利的分析結果，依產品內容雜湊跨報告、跨公司重複使用"""
+    __tablename__ = 'product_analyses'
+
+    id = db.Column(db.Integer, primary_key=True)
+    patent_publication_number = db.Column(db.String(50), nullable=False)
+    # 產品名稱、描述、專利版本與分析設定的 sha256
+    product_hash = db.Column(db.String(64), nullable=False)
+    product_name = db.Column(db.String(500), nullable=False)
+    result = db.Column(JSONB, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('idx_product_analyses_patent_product',
+                 'patent_publication_number',
+                 'product_hash',
+                 unique=True),
+    )
+
+    def __repr__(self):
+        return f'<ProductAnalysis {self.patent_publication_number} {self.product_name}>'
+
+class DataVersion(db.Model):
+    """每張資料表的匯入版本，import_data.py 寫入時遞增，各 worker 據此清除快取"""
+    __tablename__ = 'data_versions'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f'<DataVersion {self.name}={self.version}>'
+
+class Job(db.Model):
+    """背景分析工作的狀態與進度，存在資料庫中，任何 worker 都能查詢"""
+    __tablename__ = 'analysis_jobs'
+
+    job_id = db.Column(db.String(32), primary_key=True)
+    # 'analysis' 為單一專利與公司，'batch' 為多個專利對多間公司
+    job_type = db.Column(db.String(20), nullable=False)
+    patent_id = db.Column(db.String(50))
+    company_name = db.Column(db.String(200))
+    patent_ids = db.Column(JSONB)
+    company_names = db.Column(JSONB)
+    status = db.Column(db.String(20), nullable=False)
+    progress = db.Column(JSONB)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    finished_at = db.Column(db.DateTime)
+
+    # 同一組專利與公司只允許一個未完成的工作，多個 worker 同時送出時也不會重複
+    __table_args__ = (
+        db.Index('idx_analysis_jobs_unfinished_pair',
+                 'patent_id',
+                 'company_name',
+                 unique=True,
+                 postgresql_where=db.text("job_type = 'analysis' AND status IN ('queued', 'running')")),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.job_id} {self.status}>'
+
 class Report(db.Model):
     __tablename__ = 'reports'
 
@@ -48,6 +171,8 @@ class Report(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
+    products = db.relationship('ReportProduct', cascade='all, delete-orphan', passive_deletes=True)
+
     # 使用 Index 創建聯合唯一索引
     __table_args__ = (
         db.Index('idx_patent_company_unique', 
@@ -57,4 +182,26 @@ class Report(db.Model):
     )
 
     def __repr__(self):
-        return f'<Report {self.id}>'
\ No newline at end of file
+        return f'<Report {self.id}>'
+
+class ReportProduct(db.Model):
+    """報告中每個產品的摘要，供 /api/reports 以索引查詢，不必展開 analysis_data"""
+    __tablename__ = 'report_products'
+
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.Integer, db.ForeignKey('reports.id', ondelete='CASCADE'), nullable=False, index=True)
+    patent_publication_number = db.Column(db.String(50), nullable=False)
+    company_name = db.Column(db.String(200), nullable=False)
+    product_name = db.Column(db.String(500), nullable=False)
+    infringement_likelihood = db.Column(db.String(20), nullable=False)
+    relevant_claim_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('idx_report_products_company', 'company_name', 'infringement_likelihood', 'id'),
+        db.Index('idx_report_products_patent', 'patent_publication_number', 'infringement_likelihood', 'id'),
+        db.Index('idx_report_products_likelihood', 'infringement_likelihood', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<ReportProduct {self.product_name}>'
@@ -0,0 +1,46 @@
+from typing import Dict, Iterable
+from sqlalchemy.dialects.postgresql import insert
+from models import db, ProductAnalysis
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class ProductAnalysisStore:
+    """存在 Postgres 的單一產品分析結果，依專利與產品雜湊（見 PatentAnalyzer._product_key）跨報告重複使用；須在 app context 中呼叫"""
+
+    @classmethod
+    def from_env(cls):
+        if os.environ.get('ANALYSIS_PRODUCT_STORE', 'true').lower() in ('0', 'false', 'off'):
+            return None
+        return cls()
+
+    def get_many(self, patent_id: str, product_hashes: Iterable[str]) -> Dict[str, Dict]:
+        """以一次查詢取得已存的結果，依產品雜湊索引"""
+        product_hashes = list(set(product_hashes))
+        if not product_hashes:
+            return {}
+        rows = db.session.query(ProductAnalysis.product_hash, ProductAnalysis.result) \
+            .filter(ProductAnalysis.patent_publication_number == patent_id,
+                    ProductAnalysis.product_hash.in_(product_hashes)) \
+            .all()
+        return dict(rows)
+
+    def put(self, patent_id: str, product_hash: str, product_name: str, result: Dict) -> None:
+        """儲存單一產品的結果；失敗只記錄 log，不影響報告"""
+        statement = insert(ProductAnalysis.__table__).values(
+            patent_publication_number=patent_id,
+            product_hash=product_hash,
+            product_name=product_name,
+            result=result
+        ).on_conflict_do_update(
+            index_elements=['patent_publication_number', 'product_hash'],
+            set_={'product_name': product_name, 'result': result}
+        )
+        try:
+            db.session.execute(statement)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f'Error storing analysis of {product_name} for {patent_id}: {str(e)}')
@@ -0,0 +1,234 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+from dataclasses import asdict
+from sqlalchemy import Text, cast, text
+from models import db, Report, ReportProduct
+from analysis import InfringingProduct, PatentAnalyzer
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def find_report(patent_id: str, company_name: str) -> Optional[Report]:
+    """Look up a cached report for a patent/company pair"""
+    return Report.query.filter_by(patent_publication_number=patent_id, company_name=company_name).first()
+
+
+def find_report_json(patent_id: str, company_name: str) -> Optional[Tuple[int, str]]:
+    """Like find_report, but return (report id, analysis_data as JSON text) serialized by Postgres"""
+    return db.session.query(Report.id, cast(Report.analysis_data, Text)) \
+        .filter(Report.patent_publication_number == patent_id, Report.company_name == company_name) \
+        .first()
+
+
+def get_report_json(report_id: int) -> Optional[str]:
+    """analysis_data of a stored report as JSON text, without decoding it in Python"""
+    return db.session.query(cast(Report.analysis_data, Text)).filter(Report.id == report_id).scalar()
+
+
+def generate_and_store_report(analyzer: PatentAnalyzer,
+                              patent_id: str,
+                              company_name: str,
+                              progress_callback: Optional[Callable[[int, int], None]] = None) -> Optional[Dict]:
+    """Run the analyzer and persist the result to the reports table"""
+    logger.debug("Calling analyzer.iter_infringement_report")
+    report = None
+    products = []
+    for event, data in analyzer.iter_infringement_report(patent_id, company_name, progress_callback):
+        if event == 'product':
+            products.append(data)
+        elif event == 'report':
+            report = data
+
+    if not report:
+        logger.warning("No report generated by analyzer")
+        return None
+    logger.debug("Successfully generated report")
+
+    store_report(patent_id, company_name, report, products)
+    return report
+
+
+def store_report(patent_id: str, company_name: str, report: Dict, products: List[InfringingProduct]) -> None:
+    """Persist a finished report and its per-product index rows"""
+    reportRecord = Report(
+        patent_publication_number=patent_id,
+        company_name=company_name,
+        analysis_data=report
+    )
+    reportRecord.products = [
+        ReportProduct(
+            patent_publication_number=patent_id,
+            company_name=company_name,
+            product_name=product.product_name,
+            infringement_likelihood=product.infringement_likelihood,
+            relevant_claim_count=len(product.relevant_claims)
+        )
+        for product in products
+    ]
+    db.session.add(reportRecord)
+    try:
+        db.session.commit()
+        logger.info('reportRecord imported successfully')
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Error importing reportRecord: {str(e)}')
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into a single execution"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def join(self, key: str) -> Tuple[_Call, bool]:
+        """Register interest in key; returns the call and whether the caller leads it"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+        return call, leader
+
+    def wait(self, call: _Call) -> Any:
+        """Block a follower until the leader finishes, then return or raise its outcome"""
+        call.event.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def finish(self, key: str, call: _Call, result: Any = None, error: Optional[Exception] = None) -> None:
+        """Publish the leader's outcome and let the next caller for key lead again"""
+        call.result = result
+        call.error = error
+        with self._lock:
+            del self._calls[key]
+        call.event.set()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        call, leader = self.join(key)
+        if not leader:
+            return self.wait(call)
+
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result)
+        return result
+
+
+_inflight_reports = SingleFlight()
+
+
+@contextmanager
+def advisory_lock(key: str):
+    """Hold a Postgres session advisory lock so other processes wait on the same key"""
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text('SELECT pg_advisory_lock(hashtext(:key))'), {'key': key})
+        try:
+            yield
+        finally:
+            conn.execute(text('SELECT pg_advisory_unlock(hashtext(:key))'), {'key': key})
+
+
+def _report_key(patent_id: str, company_name: str) -> str:
+    return f'report:{patent_id}:{company_name}'
+
+
+def get_or_create_report(analyzer: PatentAnalyzer,
+                         patent_id: str,
+                         company_name: str,
+                         progress_callback: Optional[Callable[[int, int], None]] = None) -> Optional[Dict]:
+    """Return the cached report or generate it once, even with concurrent callers"""
+    key = _report_key(patent_id, company_name)
+
+    def compute():
+        with advisory_lock(key):
+            # Another process may have finished while we waited for the lock
+            db.session.expire_all()
+            reportRecord = find_report(patent_id, company_name)
+            if reportRecord:
+                logger.debug("Report generated by a concurrent request")
+                return reportRecord.analysis_data
+            return generate_and_store_report(analyzer, patent_id, company_name,
+                                             progress_callback=progress_callback)
+
+    return _inflight_reports.do(key, compute)
+
+
+def stream_report(analyzer: PatentAnalyzer,
+                  patent_id: str,
+                  company_name: str) -> Iterator[Tuple[str, Any]]:
+    """Yield JSON-ready (event, data) pairs as the analysis progresses, storing the final report
+
+    Shares the single-flight key and advisory lock of get_or_create_report, so
+    a stream never runs the analysis alongside another request for the same
+    pair; it waits for that request and sends the stored report instead.
+    """
+    reportRecord = find_report(patent_id, company_name)
+    if reportRecord:
+        logger.debug("Report already exists")
+        yield 'report', reportRecord.analysis_data
+        return
+
+    key = _report_key(patent_id, company_name)
+    call, leader = _inflight_reports.join(key)
+    if not leader:
+        logger.debug("Waiting for a concurrent analysis of the same pair")
+        report = _inflight_reports.wait(call)
+        if report:
+            yield 'report', report
+        else:
+            yield 'error', {'message': 'No report generated'}
+        return
+
+    report = None
+    try:
+        with advisory_lock(key):
+            # Another process may have finished while we waited for the lock
+            db.session.expire_all()
+            reportRecord = find_report(patent_id, company_name)
+            if reportRecord:
+                logger.debug("Report generated by a concurrent request")
+                report = reportRecord.analysis_data
+                yield 'report', report
+                return
+
+            products = []
+            for event, data in analyzer.iter_infringement_report(patent_id, company_name):
+                if event == 'product':
+                    products.append(data)
+                    data = asdict(data)
+                elif event == 'top_products':
+                    data = [asdict(p) for p in data]
+                elif event == 'report':
+                    store_report(patent_id, company_name, data, products)
+                    report = data
+                yield event, data
+
+            if report is None:
+                logger.warning("No report generated by analyzer")
+                yield 'error', {'message': 'No report generated'}
+    except Exception as e:
+        _inflight_reports.finish(key, call, error=e)
+        raise
+    finally:
+        # Also runs when the client disconnects mid-stream (GeneratorExit)
+        if not call.event.is_set():
+            _inflight_reports.finish(key, call, report)
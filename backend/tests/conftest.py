@@ -0,0 +1,30 @@
+import os
+import sys
+import pytest
+
+# Backend modules import each other as top-level modules (see Dockerfile WORKDIR)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db_app():
+    """Flask app bound to the Postgres database in TEST_DATABASE_URL; its rows are deleted after each test"""
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    flask = pytest.importorskip('flask')
+    pytest.importorskip('psycopg2')
+    from models import db
+
+    app = flask.Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+        db.engine.dispose()
@@ -0,0 +1,103 @@
+import threading
+import time
+import pytest
+
+pytest.importorskip('openai')
+pytest.importorskip('flask_sqlalchemy')
+pytest.importorskip('prometheus_client')
+
+from analysis import LLMClient, PRIORITY_BATCH, PRIORITY_INTERACTIVE, TokenBucketLimiter, parse_consolidated_response
+
+CLAIMS = [
+    {'num': '001', 'text': 'A device comprising a sensor.'},
+    {'num': '002', 'text': 'The device of claim 1, further comprising a battery.'},
+    {'num': '003', 'text': 'A method of sensing.'}
+]
+
+
+def test_limiter_does_not_wait_with_budget_left():
+    limiter = TokenBucketLimiter(requests_per_minute=600, tokens_per_minute=100000)
+    started = time.monotonic()
+    for _ in range(10):
+        limiter.acquire(100)
+    assert time.monotonic() - started < 0.05
+
+
+def test_limiter_serves_interactive_before_batch():
+    # 10 requests per second once the bucket is empty
+    limiter = TokenBucketLimiter(requests_per_minute=600, tokens_per_minute=1000000)
+    limiter._requests = 0
+    order = []
+
+    def acquire(name, priority):
+        limiter.acquire(1, priority=priority)
+        order.append(name)
+
+    batch = threading.Thread(target=acquire, args=('batch', PRIORITY_BATCH))
+    batch.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=acquire, args=('interactive', PRIORITY_INTERACTIVE))
+    interactive.start()
+    batch.join(2)
+    interactive.join(2)
+    assert order == ['interactive', 'batch']
+
+
+def test_limiter_caps_requests_larger_than_the_bucket():
+    limiter = TokenBucketLimiter(requests_per_minute=600, tokens_per_minute=1000)
+    started = time.monotonic()
+    limiter.acquire(5000)
+    assert time.monotonic() - started < 0.05
+
+
+def test_limiter_burst_is_a_few_seconds_of_quota():
+    # 6000 RPM refills 100 requests per second; the bucket holds 0.1 seconds' worth
+    limiter = TokenBucketLimiter(requests_per_minute=6000, tokens_per_minute=10 ** 9, burst_seconds=0.1)
+    started = time.monotonic()
+    for _ in range(30):
+        limiter.acquire(1)
+    # 10 requests from the bucket, the other 20 at the refill rate
+    assert time.monotonic() - started >= 0.15
+
+
+def test_oversized_request_is_charged_in_full():
+    limiter = TokenBucketLimiter(requests_per_minute=6000, tokens_per_minute=600, burst_seconds=1)
+    limiter.acquire(50)
+    assert limiter._tokens == pytest.approx(-40, abs=1)
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__('429')
+        self.headers = {'retry-after': retry_after}
+
+
+def test_retry_after_is_capped_at_backoff_max():
+    client = LLMClient(backoff_max=30)
+    assert client._backoff(0, RateLimited('3600')) == 30
+    assert client._backoff(0, RateLimited('2')) == 2
+    assert 0 <= client._backoff(10, RateLimited('soon')) <= 30
+
+
+def test_parse_consolidated_response():
+    text = ('Here is the analysis:\n'
+            '{"relevant_claims": [3, "1"], "explanation": " Matches. ", '
+            '"specific_features": ["- sensor", "", "battery"]}')
+    relevant, explanation, features = parse_consolidated_response(text, CLAIMS)
+    # Claims come back in patent order whatever order the model listed them in
+    assert relevant == [CLAIMS[0]['text'], CLAIMS[2]['text']]
+    assert explanation == 'Matches.'
+    assert features == ['sensor', 'battery']
+
+
+@pytest.mark.parametrize('text', [
+    'no json here',
+    '{"relevant_claims": [1], "explanation": "x"',
+    '{"relevant_claims": "1", "explanation": "x", "specific_features": []}',
+    '{"relevant_claims": [1], "explanation": 5, "specific_features": []}',
+    '{"relevant_claims": [1], "explanation": "x", "specific_features": [1]}',
+    '{"relevant_claims": [9], "explanation": "x", "specific_features": []}'
+])
+def test_parse_consolidated_response_rejects_malformed(text):
+    with pytest.raises(ValueError):
+        parse_consolidated_response(text, CLAIMS)
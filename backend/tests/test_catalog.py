@@ -0,0 +1,130 @@
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+pytest.importorskip('prometheus_client')
+
+import catalog
+from catalog import CatalogCache
+
+
+class FakeSession:
+    def __init__(self):
+        self.versions = {'patents': 1, 'companies': 1}
+        self.fail = False
+        self.queries = 0
+
+    def query(self, *columns):
+        return self
+
+    def all(self):
+        self.queries += 1
+        if self.fail:
+            raise RuntimeError('database unavailable')
+        return list(self.versions.items())
+
+    def rollback(self):
+        pass
+
+
+class FakeDB:
+    def __init__(self, session):
+        self.session = session
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(catalog, 'db', FakeDB(session))
+    return session
+
+
+def loader(value, calls):
+    def load():
+        calls.append(value)
+        return value
+    return load
+
+
+def test_loader_runs_once_per_key(session):
+    cache = CatalogCache(max_bytes=1 << 20, check_interval=60)
+    calls = []
+    assert cache.get(('patents', 'detail', 'US-1'), loader({'title': 'a'}, calls)) == {'title': 'a'}
+    assert cache.get(('patents', 'detail', 'US-1'), loader({'title': 'b'}, calls)) == {'title': 'a'}
+    assert calls == [{'title': 'a'}]
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (1, 1)
+
+
+def test_none_is_not_cached(session):
+    cache = CatalogCache(check_interval=60)
+    calls = []
+    cache.get(('patents', 'detail', 'missing'), loader(None, calls))
+    cache.get(('patents', 'detail', 'missing'), loader(None, calls))
+    assert calls == [None, None]
+
+
+def test_evicts_least_recently_used_by_size(session):
+    value = 'x' * 100
+    cache = CatalogCache(max_bytes=250, check_interval=60)
+    cache.get(('patents', 'a'), lambda: value)
+    cache.get(('patents', 'b'), lambda: value)
+    cache.get(('patents', 'a'), lambda: 'reloaded')
+    cache.get(('patents', 'c'), lambda: value)
+    # b was used least recently
+    assert cache.get(('patents', 'b'), lambda: 'reloaded') == 'reloaded'
+    assert cache.get(('patents', 'a'), lambda: 'reloaded') == value
+    assert cache.stats()['bytes'] <= 250
+
+
+def test_value_larger_than_cache_is_not_stored(session):
+    cache = CatalogCache(max_bytes=10, check_interval=60)
+    calls = []
+    cache.get(('patents', 'big'), loader('x' * 100, calls))
+    cache.get(('patents', 'big'), loader('x' * 100, calls))
+    assert len(calls) == 2
+    assert cache.stats()['entries'] == 0
+
+
+def test_new_version_drops_only_that_table(session):
+    cache = CatalogCache(check_interval=0)
+    cache.get(('patents', 'detail', 'US-1'), lambda: 'patent v1')
+    cache.get(('companies', 'list'), lambda: 'companies v1')
+
+    session.versions['patents'] = 2
+    assert cache.get(('patents', 'detail', 'US-1'), lambda: 'patent v2') == 'patent v2'
+    assert cache.get(('companies', 'list'), lambda: 'companies v2') == 'companies v1'
+    assert cache.version('patents') == 2
+
+
+def test_value_loaded_across_an_invalidation_is_not_cached(session):
+    cache = CatalogCache(check_interval=60)
+
+    def load():
+        # An import lands while the loader is reading the old rows
+        cache.clear()
+        return 'stale'
+
+    assert cache.get(('patents', 'detail', 'US-1'), load) == 'stale'
+    assert cache.get(('patents', 'detail', 'US-1'), lambda: 'fresh') == 'fresh'
+
+
+def test_versions_are_polled_at_most_once_per_interval(session):
+    cache = CatalogCache(check_interval=60)
+    for _ in range(5):
+        cache.get(('patents', 'a'), lambda: 'value')
+    assert session.queries == 1
+
+
+def test_unreadable_versions_clear_the_cache(session):
+    cache = CatalogCache(check_interval=0)
+    cache.get(('patents', 'a'), lambda: 'old')
+    session.fail = True
+    assert cache.get(('patents', 'a'), lambda: 'new') == 'new'
+
+
+def test_disabled_cache_always_loads(session):
+    cache = CatalogCache(max_bytes=0)
+    calls = []
+    cache.get(('patents', 'a'), loader('v', calls))
+    cache.get(('patents', 'a'), loader('v', calls))
+    assert calls == ['v', 'v']
+    assert session.queries == 0
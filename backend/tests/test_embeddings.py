@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from embeddings import ClaimPrefilter, EmbeddingStore, HashingEmbedder, OpenAIEmbedder
+
+CLAIMS = [
+    {'num': '1', 'text': 'A vehicle with a battery pack and an electric motor.'},
+    {'num': '2', 'text': 'A method of brewing coffee with hot water.'},
+    {'num': '3', 'text': 'The vehicle of claim 1 wherein the battery pack is liquid cooled.'},
+    {'num': '4', 'text': 'A shoe with a rubber sole.'}
+]
+PRODUCT = 'Electric vehicle with a liquid cooled battery pack'
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=256)
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return super().embed(texts)
+
+
+def test_keeps_most_similar_claims_in_patent_order():
+    prefilter = ClaimPrefilter(HashingEmbedder(), top_k=2)
+    assert [claim['num'] for claim in prefilter.select(CLAIMS, PRODUCT)] == ['1', '3']
+
+
+def test_threshold_drops_unrelated_claims():
+    prefilter = ClaimPrefilter(HashingEmbedder(), top_k=None, threshold=0.3)
+    assert [claim['num'] for claim in prefilter.select(CLAIMS, PRODUCT)] == ['1', '3']
+
+
+def test_claims_and_products_are_embedded_once():
+    embedder = CountingEmbedder()
+    prefilter = ClaimPrefilter(embedder, top_k=2)
+    for _ in range(3):
+        prefilter.select(CLAIMS, PRODUCT)
+    prefilter.select(CLAIMS[:2], PRODUCT)
+    texts = [text for call in embedder.calls for text in call]
+    assert texts.count(PRODUCT) == 1
+    assert texts.count(CLAIMS[0]['text']) == 2  # once for each distinct claim set
+
+
+def test_vectors_persist_across_processes(tmp_path):
+    ClaimPrefilter(HashingEmbedder(), store=EmbeddingStore(str(tmp_path))).select(CLAIMS, PRODUCT)
+    embedder = CountingEmbedder()
+    embedder.name = HashingEmbedder().name
+    prefilter = ClaimPrefilter(embedder, store=EmbeddingStore(str(tmp_path)))
+    prefilter.select(CLAIMS, PRODUCT)
+    assert embedder.calls == []
+
+
+def test_empty_claims():
+    assert ClaimPrefilter(HashingEmbedder()).select([], PRODUCT) == []
+
+
+class FakeClient:
+    def __init__(self):
+        self.batches = []
+
+    def embed(self, texts, model):
+        self.batches.append((list(texts), model))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def test_openai_embedder_batches_through_the_llm_client():
+    client = FakeClient()
+    vectors = OpenAIEmbedder(client, model='embedding-model', batch_size=2).embed(['a', 'bb', 'ccc'])
+    assert [batch for batch, _ in client.batches] == [['a', 'bb'], ['ccc']]
+    assert {model for _, model in client.batches} == {'embedding-model'}
+    assert vectors.shape == (3, 2)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+
+
+def test_llm_client_retries_embedding_rate_limits():
+    openai = pytest.importorskip('openai')
+    pytest.importorskip('flask_sqlalchemy')
+    pytest.importorskip('prometheus_client')
+    from analysis import LLMClient
+
+    failures = [openai.error.RateLimitError('rate limited')]
+
+    def create(**params):
+        if failures:
+            raise failures.pop()
+        return {'data': [{'index': 1, 'embedding': [0.0, 1.0]}, {'index': 0, 'embedding': [1.0, 0.0]}]}
+
+    client = LLMClient(embedding_fn=create, backoff_base=0.001)
+    assert client.embed(['a', 'b'], 'embedding-model') == [[1.0, 0.0], [0.0, 1.0]]
+    assert not failures
@@ -0,0 +1,81 @@
+import pytest
+
+pytest.importorskip('werkzeug')
+flask = pytest.importorskip('flask')
+
+from http_cache import conditional
+
+
+@pytest.fixture
+def app():
+    app = flask.Flask(__name__)
+    app.state = {'version': 'v1', 'calls': 0}
+
+    def version():
+        if app.state['version'] == 'error':
+            raise RuntimeError('database unavailable')
+        return app.state['version']
+
+    @app.route('/items')
+    @conditional(lambda: version())
+    def items():
+        app.state['calls'] += 1
+        return flask.jsonify({'items': [1, 2]})
+
+    @app.route('/missing')
+    @conditional(lambda: 'v1')
+    def missing():
+        return flask.jsonify({'message': 'not found'}), 404
+
+    return app
+
+
+def test_first_request_gets_etag_and_cache_control(app):
+    response = app.test_client().get('/items')
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'public, max-age=60, must-revalidate'
+
+
+def test_current_etag_gets_304_without_running_the_view(app):
+    client = app.test_client()
+    etag = client.get('/items').headers['ETag']
+    response = client.get('/items', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    assert app.state['calls'] == 1
+
+
+def test_compressed_etag_suffix_is_ignored(app):
+    client = app.test_client()
+    etag = client.get('/items').headers['ETag'].strip('"')
+    response = client.get('/items', headers={'If-None-Match': f'"{etag}:gzip"'})
+    assert response.status_code == 304
+
+
+def test_changed_data_gets_a_new_etag(app):
+    client = app.test_client()
+    etag = client.get('/items').headers['ETag']
+    app.state['version'] = 'v2'
+    response = client.get('/items', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_query_string_is_part_of_the_etag(app):
+    client = app.test_client()
+    assert client.get('/items?limit=1').headers['ETag'] != client.get('/items?limit=2').headers['ETag']
+
+
+def test_errors_are_not_cached(app):
+    response = app.test_client().get('/missing')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+
+def test_failed_fingerprint_runs_the_view(app):
+    app.state['version'] = 'error'
+    response = app.test_client().get('/items', headers={'If-None-Match': '*'})
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
@@ -0,0 +1,182 @@
+import json
+import pytest
+
+pytest.importorskip('psycopg2')
+
+from import_data import (checkpoint_source, iter_chunk_ranges, iter_chunks, iter_json_records, iter_record_offsets,
+                         load_checkpoints, load_chunk, patent_row, read_chunk_rows)
+
+
+def write_json(tmp_path, data, name='data.json'):
+    path = tmp_path / name
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('read_size', [1, 7, 1 << 16])
+def test_records_under_key(tmp_path, read_size):
+    path = write_json(tmp_path, {'companies': [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]})
+    records = [record for _, record in iter_json_records(path, 'companies', read_size=read_size)]
+    assert records == [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]
+
+
+def test_key_is_matched_only_at_top_level(tmp_path):
+    path = write_json(tmp_path, {
+        'title': 'companies',
+        'list': [1, 2],
+        'meta': {'companies': [3]},
+        'companies': [{'name': 'a'}]
+    })
+    for read_size in (1, 5, 1 << 16):
+        assert [record for _, record in iter_json_records(path, 'companies', read_size=read_size)] == [{'name': 'a'}]
+
+
+def test_missing_or_non_array_key(tmp_path):
+    with pytest.raises(ValueError):
+        list(iter_json_records(write_json(tmp_path, {'patents': []}, 'a.json'), 'companies'))
+    with pytest.raises(ValueError):
+        list(iter_json_records(write_json(tmp_path, {'companies': 'none'}, 'b.json'), 'companies'))
+
+
+def test_offsets_resume_after_each_record(tmp_path):
+    # Non-ASCII text checks that offsets count bytes, not characters
+    data = [{'title': 'patent %d' % i, 'abstract': '專利摘要 %d' % i} for i in range(5)]
+    path = write_json(tmp_path, data)
+    records = list(iter_json_records(path, read_size=16))
+    assert [record for _, record in records] == data
+    for i, (end_offset, _) in enumerate(records):
+        resumed = [record for _, record in iter_json_records(path, start_offset=end_offset, read_size=16)]
+        assert resumed == data[i + 1:]
+
+
+def test_json_lines_offsets(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    lines = [json.dumps({'n': i}) + '\n' for i in range(3)]
+    path.write_text('\n'.join(lines), encoding='utf-8')
+    records = list(iter_json_records(str(path)))
+    assert [record for _, record in records] == [{'n': 0}, {'n': 1}, {'n': 2}]
+    assert [record for _, record in iter_json_records(str(path), start_offset=records[0][0])] == [{'n': 1}, {'n': 2}]
+
+
+@pytest.mark.parametrize('name', ['data.json', 'data.jsonl'])
+def test_worker_byte_ranges_match_serial_chunks(tmp_path, name):
+    patents = [{'publication_number': 'US-%d' % i, 'title': '專利 %d' % i} for i in range(7)]
+    path = tmp_path / name
+    if name.endswith('.jsonl'):
+        path.write_text(''.join(json.dumps(patent) + '\n' for patent in patents), encoding='utf-8')
+    else:
+        path.write_text(json.dumps(patents), encoding='utf-8')
+    path = str(path)
+
+    serial = list(iter_chunks(iter_json_records(path), 3, 0, patent_row))
+    ranges = list(iter_chunk_ranges(iter_record_offsets(path), 3, 0))
+    assert [(start, end, len(rows)) for start, end, rows in serial] == ranges
+    for start, end, rows in serial:
+        assert read_chunk_rows(path, None, start, end, patent_row) == rows
+
+
+class FakeCursor:
+    def __init__(self, rows, rowcount=0):
+        self.rows = rows
+        self.rowcount = rowcount
+        self.statements = []
+        self.params = []
+        self.copied = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params=None):
+        self.statements.append(' '.join(statement.split()))
+        self.params.append(params)
+
+    def copy_expert(self, statement, buffer):
+        self.execute(statement)
+        self.copied = buffer.read()
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def ran(self, prefix):
+        return [params for statement, params in zip(self.statements, self.params) if statement.startswith(prefix)]
+
+
+class FakeConnection:
+    def __init__(self, rows, rowcount=0):
+        self.cursor_obj = FakeCursor(rows, rowcount)
+        self.commits = 0
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_load_checkpoints_resumes_after_contiguous_run():
+    # Chunks finish out of order with several workers; 300-400 is still missing
+    rows = [(0, 100), (100, 200), (200, 300), (400, 500)]
+    resume_offset, spans = load_checkpoints(FakeConnection(rows), 'patents:data.json')
+    assert resume_offset == 300
+    assert spans == set(rows)
+
+
+def test_load_checkpoints_without_first_chunk():
+    resume_offset, spans = load_checkpoints(FakeConnection([(100, 200)]), 'patents:data.json')
+    assert resume_offset == 0
+    assert spans == {(100, 200)}
+
+
+def test_load_checkpoints_restart_clears_source():
+    conn = FakeConnection([(0, 100)])
+    assert load_checkpoints(conn, 'patents:data.json', restart=True) == (0, set())
+    assert conn.commits == 1
+    assert conn.cursor_obj.statements[0].startswith('DELETE FROM import_checkpoints')
+
+
+def test_checkpoint_source_depends_on_mode(tmp_path):
+    # A file loaded in plain bulk mode must not look finished to a later --delta run
+    path = write_json(tmp_path, [])
+    assert checkpoint_source('patents', path) != checkpoint_source('patents', path, delta=True)
+    assert checkpoint_source('patents', path) != checkpoint_source('companies', path)
+
+
+PATENT = {'publication_number': 'US-1', 'title': 'Sensor', 'claims': [{'num': '1', 'text': 'A sensor.'}]}
+
+
+def test_delta_chunk_deletes_reports_of_changed_rows():
+    # RETURNING lists the keys whose content hash changed
+    conn = FakeConnection([('US-1',)])
+    assert load_chunk(conn, ('patents', 'source', 0, 100, [patent_row(PATENT)], True)) == 1
+    cur = conn.cursor_obj
+    assert cur.copied.startswith('US-1\tSensor\t')
+    merge = [statement for statement in cur.statements if statement.startswith('INSERT INTO patents')][0]
+    assert 'IS DISTINCT FROM EXCLUDED.content_hash' in merge
+    assert cur.ran('DELETE FROM reports WHERE patent_publication_number') == [(['US-1'],)]
+    assert cur.ran('DELETE FROM product_analyses') == [(['US-1'],)]
+    assert cur.ran('INSERT INTO import_checkpoints') == [('source', 0, 100, 1)]
+    assert cur.ran('INSERT INTO data_versions') == [('patents',)]
+    assert conn.commits == 1
+
+
+def test_delta_chunk_without_changes_keeps_reports():
+    conn = FakeConnection([])
+    load_chunk(conn, ('companies', 'source', 0, 10, [('Acme', [], 'hash')], True))
+    cur = conn.cursor_obj
+    assert not cur.ran('DELETE FROM reports')
+    assert not cur.ran('DELETE FROM product_analyses')
+    assert not cur.ran('INSERT INTO data_versions')
+    assert cur.ran('INSERT INTO import_checkpoints') == [('source', 0, 10, 1)]
+
+
+def test_plain_chunk_skips_existing_rows():
+    conn = FakeConnection([], rowcount=1)
+    load_chunk(conn, ('patents', 'source', 0, 100, [patent_row(PATENT)], False))
+    cur = conn.cursor_obj
+    merge = [statement for statement in cur.statements if statement.startswith('INSERT INTO patents')][0]
+    assert merge.endswith('ON CONFLICT (publication_number) DO NOTHING')
+    assert not cur.ran('DELETE FROM reports')
+    assert cur.ran('INSERT INTO data_versions') == [('patents',)]
@@ -0,0 +1,138 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+import jobs
+from batch import BatchStats
+from jobs import AnalysisJob, BatchJob, JobManager
+from models import db, Job
+
+
+@pytest.fixture
+def blocked_reports(monkeypatch):
+    """get_or_create_report that waits until the test releases it, so jobs stay unfinished"""
+    release = threading.Event()
+    calls = []
+
+    def fake_report(analyzer, patent_id, company_name, progress_callback=None):
+        calls.append((patent_id, company_name))
+        progress_callback(1, 2)
+        release.wait(10)
+        progress_callback(2, 2)
+        return {'patent_id': patent_id}
+
+    monkeypatch.setattr(jobs, 'get_or_create_report', fake_report)
+    yield release, calls
+    release.set()
+
+
+def finish(*managers):
+    for manager in managers:
+        manager._executor.shutdown(wait=True)
+        manager._batch_executor.shutdown(wait=True)
+
+
+def test_unfinished_pair_is_reused_across_managers(db_app, blocked_reports):
+    release, calls = blocked_reports
+    first, second = JobManager(db_app, analyzer=None), JobManager(db_app, analyzer=None)
+
+    job = first.submit('US-1', 'Acme')
+    assert second.submit('US-1', 'Acme').job_id == job.job_id
+    assert second.submit('US-2', 'Acme').job_id != job.job_id
+
+    release.set()
+    finish(first, second)
+    assert calls.count(('US-1', 'Acme')) == 1
+    done = second.get(job.job_id)
+    assert isinstance(done, AnalysisJob)
+    assert (done.status, done.completed_products, done.total_products) == ('completed', 2, 2)
+    assert done.finished_at is not None
+
+    # A finished pair can be queued again
+    third = JobManager(db_app, analyzer=None)
+    assert third.submit('US-1', 'Acme').job_id != job.job_id
+    finish(third)
+
+
+def test_stale_job_is_failed_and_replaced(db_app, blocked_reports):
+    release, _ = blocked_reports
+    manager = JobManager(db_app, analyzer=None, stale_after=60)
+    with db_app.app_context():
+        # Left running by a worker that died two minutes ago
+        db.session.add(Job(job_id='abandoned', job_type='analysis', patent_id='US-1', company_name='Acme',
+                           status='running', updated_at=datetime.now() - timedelta(minutes=2)))
+        db.session.add(Job(job_id='recent', job_type='analysis', patent_id='US-2', company_name='Acme',
+                           status='running', updated_at=datetime.now()))
+        db.session.commit()
+
+    assert manager.submit('US-1', 'Acme').job_id != 'abandoned'
+    assert manager.submit('US-2', 'Acme').job_id == 'recent'
+
+    abandoned = manager.get('abandoned')
+    assert abandoned.status == 'failed'
+    assert abandoned.error == 'Job abandoned by its worker'
+    assert manager.get('recent').status == 'running'
+    release.set()
+    finish(manager)
+
+
+def test_failed_analysis_records_the_error(db_app, monkeypatch):
+    def failing_report(analyzer, patent_id, company_name, progress_callback=None):
+        raise RuntimeError('model unavailable')
+
+    monkeypatch.setattr(jobs, 'get_or_create_report', failing_report)
+    manager = JobManager(db_app, analyzer=None)
+    job = manager.submit('US-1', 'Acme')
+    finish(manager)
+    failed = manager.get(job.job_id)
+    assert (failed.status, failed.error) == ('failed', 'model unavailable')
+
+
+def test_batch_progress_is_saved(db_app, monkeypatch):
+    seen = []
+
+    class FakeRunner:
+        def __init__(self, app, analyzer, max_workers):
+            pass
+
+        def run(self, patent_ids, company_names, stats, on_progress):
+            stats.total_pairs = len(patent_ids) * len(company_names)
+            stats.completed_pairs = 1
+            on_progress(stats)
+            seen.append(manager.get(job.job_id).stats.completed_pairs)
+            stats.completed_pairs = stats.total_pairs
+
+    monkeypatch.setattr(jobs, 'BatchRunner', FakeRunner)
+    manager = JobManager(db_app, analyzer=None)
+    job = manager.submit_batch(['US-1', 'US-2'], ['Acme'])
+    finish(manager)
+
+    assert seen == [1]
+    done = manager.get(job.job_id)
+    assert isinstance(done, BatchJob)
+    assert done.status == 'completed'
+    assert (done.patent_ids, done.company_names) == (['US-1', 'US-2'], ['Acme'])
+    assert (done.stats.total_pairs, done.stats.completed_pairs) == (2, 2)
+    assert manager.get('missing') is None
+
+
+def test_prune_keeps_newest_and_unfinished_jobs(db_app, blocked_reports):
+    release, _ = blocked_reports
+    manager = JobManager(db_app, analyzer=None, max_retained_jobs=2)
+    now = datetime.now()
+    with db_app.app_context():
+        for minutes, job_id, status in [(30, 'old-done', 'completed'), (20, 'old-running', 'running'),
+                                        (10, 'new-done', 'failed')]:
+            db.session.add(Job(job_id=job_id, job_type='batch', status=status,
+                               progress=vars(BatchStats()), created_at=now - timedelta(minutes=minutes)))
+        db.session.commit()
+
+    job = manager.submit('US-1', 'Acme')
+    with db_app.app_context():
+        remaining = {job_id for job_id, in db.session.query(Job.job_id)}
+    assert remaining == {'old-running', 'new-done', job.job_id}
+    release.set()
+    finish(manager)
@@ -0,0 +1,65 @@
+import json
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+import pytest
+
+pytest.importorskip('werkzeug')
+flask = pytest.importorskip('flask')
+
+from flask.json.provider import DefaultJSONProvider
+from json_provider import FastJSONProvider
+
+VALUE = {
+    'name': '專利',
+    'when': datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+    'day': date(2024, 5, 1),
+    'price': Decimal('1.50'),
+    'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'nested': {'b': [1, 2.5, None, True], 'a': 'x'},
+    'big': 2 ** 70
+}
+
+
+@pytest.fixture
+def app():
+    app = flask.Flask(__name__)
+    app.json = FastJSONProvider(app)
+    return app
+
+
+def test_dumps_matches_the_default_provider(app):
+    expected = DefaultJSONProvider(app).dumps(VALUE)
+    assert json.loads(app.json.dumps(VALUE)) == json.loads(expected)
+
+
+def test_keys_are_sorted_like_the_default_provider(app):
+    keys = list(json.loads(app.json.dumps(VALUE)))
+    assert keys == sorted(VALUE)
+
+
+def test_dumps_is_compact_in_debug_mode(app):
+    # SSE data lines must not contain newlines
+    app.debug = True
+    assert '\n' not in app.json.dumps(VALUE)
+
+
+def test_response_indents_only_in_debug_mode(app):
+    with app.test_request_context():
+        assert b'\n' not in app.json.response(VALUE).get_data()
+        app.debug = True
+        assert b'\n' in app.json.response(VALUE).get_data()
+        app.json.compact = True
+        assert b'\n' not in app.json.response(VALUE).get_data()
+
+
+def test_response_matches_jsonify(app):
+    with app.test_request_context():
+        response = flask.jsonify(VALUE)
+        assert response.mimetype == 'application/json'
+        assert json.loads(response.get_data()) == json.loads(DefaultJSONProvider(app).dumps(VALUE))
+
+
+def test_loads_round_trip(app):
+    assert app.json.loads('{"a": [1, "專利"]}') == {'a': [1, '專利']}
+    assert app.json.loads(b'{"a": 1}') == {'a': 1}
@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from models import db
+from product_store import ProductAnalysisStore
+
+RESULT = {'product_name': 'Phone', 'infringement_likelihood': 'High', 'relevant_claims': ['1'],
+          'explanation': 'Uses the sensor.', 'specific_features': ['sensor']}
+
+
+def test_stored_results_are_returned_by_hash(db_app):
+    store = ProductAnalysisStore()
+    with db_app.app_context():
+        store.put('US-1', 'hash-a', 'Phone', RESULT)
+        store.put('US-1', 'hash-b', 'Watch', dict(RESULT, product_name='Watch'))
+        store.put('US-2', 'hash-a', 'Phone', dict(RESULT, infringement_likelihood='Low'))
+
+        stored = store.get_many('US-1', ['hash-a', 'hash-b', 'hash-c', 'hash-a'])
+    assert stored == {'hash-a': RESULT, 'hash-b': dict(RESULT, product_name='Watch')}
+
+
+def test_put_replaces_the_result_for_the_same_hash(db_app):
+    store = ProductAnalysisStore()
+    with db_app.app_context():
+        store.put('US-1', 'hash-a', 'Phone', RESULT)
+        store.put('US-1', 'hash-a', 'Phone', dict(RESULT, infringement_likelihood='Low'))
+        assert store.get_many('US-1', ['hash-a'])['hash-a']['infringement_likelihood'] == 'Low'
+
+
+def test_failed_put_is_logged_and_leaves_the_session_usable(db_app, caplog):
+    store = ProductAnalysisStore()
+    with db_app.app_context():
+        # product_name is NOT NULL
+        store.put('US-1', 'hash-a', None, RESULT)
+        assert 'Error storing analysis' in caplog.text
+        store.put('US-1', 'hash-b', 'Phone', RESULT)
+        assert list(store.get_many('US-1', ['hash-a', 'hash-b'])) == ['hash-b']
+
+
+def test_no_hashes_skips_the_query(db_app):
+    with db_app.app_context():
+        assert ProductAnalysisStore().get_many('US-1', []) == {}
+
+
+def test_store_can_be_disabled(monkeypatch):
+    monkeypatch.setenv('ANALYSIS_PRODUCT_STORE', 'off')
+    assert ProductAnalysisStore.from_env() is None
+    monkeypatch.delenv('ANALYSIS_PRODUCT_STORE')
+    assert isinstance(ProductAnalysisStore.from_env(), ProductAnalysisStore)
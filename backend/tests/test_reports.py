@@ -0,0 +1,62 @@
+import threading
+import time
+import pytest
+
+pytest.importorskip('openai')
+pytest.importorskip('flask_sqlalchemy')
+pytest.importorskip('prometheus_client')
+
+from reports import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(2)
+        return {'report': 1}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert len(calls) == 1
+    assert results == [{'report': 1}] * 5
+
+
+def test_followers_get_the_leaders_error():
+    flight = SingleFlight()
+    call, leader = flight.join('key')
+    follower_call, follower_leads = flight.join('key')
+    assert leader and not follower_leads and follower_call is call
+
+    flight.finish('key', call, error=RuntimeError('analysis failed'))
+    with pytest.raises(RuntimeError):
+        flight.wait(follower_call)
+
+
+def test_next_call_after_finish_runs_again():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+    _, leader = flight.join('other')
+    assert leader
+
+
+def test_error_is_raised_to_the_leader():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError('bad')
+
+    with pytest.raises(ValueError):
+        flight.do('key', fail)
+    # The failed call is not left behind for later callers
+    assert flight.do('key', lambda: 'ok') == 'ok'